@@ -0,0 +1,159 @@
+import numpy as np
+import graph_tools
+
+##### Reusable vertex and edge samplers for the estimators in wedge_sampler.py and parallel_sampling.py.
+##### A sampler draws an index i with probability proportional to weights[i] in O(1), with a Walker
+##### alias table (built in O(n) by Vose's method): pick a column u.a.r., and keep it or take its alias.
+#####
+##### sampler(G, kind) builds a sampler the first time it is asked for, and caches it in G.samplers.
+##### The cache is emptied when the graph changes (graph.Add_und_edge and graph.Remove_und_edge), so
+##### repeated estimation calls on the same graph only pay for the tables once. The kinds are:
+#####
+##### 'vertex':       vertex u.a.r.
+##### 'wedge':        vertex with probability proportional to {d \choose 2}, the center of a uniform wedge
+##### ('degree', d):  vertex u.a.r. among the vertices of degree exactly d
+##### 'edge':         edge u.a.r., as a pair (node1, node2) in random orientation
+#####
+##### The samples are vertices of G (names for a graph, IDs for a csr_graph). For a DAG, degrees are
+##### out-degrees, as in G.degrees.
+
+
+class alias_table(object):
+
+#### Alias table for the given weights (an array), or for n equal weights if weights is None
+####
+
+    def __init__(self,weights=None,n=0):
+        if weights is None:
+            self.n = n
+            self.prob = None            # Uniform, no table needed
+            self.alias = None
+            return
+        weights = np.asarray(weights, dtype=np.float64)
+        self.n = len(weights)
+        total = weights.sum()
+        prob = (weights*self.n/total).tolist() if total > 0 else [1.0]*self.n
+        alias = list(range(self.n))
+        small = [i for i in range(self.n) if prob[i] < 1.0]
+        large = [i for i in range(self.n) if prob[i] >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large[-1]
+            alias[s] = l                        # Column s is s with probability prob[s], and l otherwise
+            prob[l] -= 1.0 - prob[s]
+            if prob[l] < 1.0:
+                small.append(large.pop())
+        for i in small + large:                 # Left over only through rounding
+            prob[i] = 1.0
+        self.prob = np.array(prob)
+        self.alias = np.array(alias, dtype=np.int64)
+
+#### Draw size indices (an array), or one index if size is None. rng is a NumPy random generator,
+#### or None for the global np.random state.
+####
+
+    def Sample(self,size=None,rng=None):
+        if rng is None:
+            column = np.random.randint(self.n, size=size)
+            coin = np.random.random_sample(size) if self.prob is not None else None
+        else:
+            column = rng.integers(0, self.n, size)
+            coin = rng.random(size) if self.prob is not None else None
+        if self.prob is None:
+            return column
+        return np.where(coin < self.prob[column], column, self.alias[column])
+
+
+class sampler(object):
+
+#### Sampler of items[i] with probability proportional to weights[i] (u.a.r. if weights is None)
+####
+
+    def __init__(self,items,weights=None):
+        self.items = items
+        self.table = alias_table(weights, len(items))
+
+#### One item if size is None, otherwise a list (or array) of size items
+####
+
+    def Sample(self,size=None,rng=None):
+        index = self.table.Sample(size, rng)
+        if size is None:
+            return self.items[index]
+        if isinstance(self.items, np.ndarray):
+            return self.items[index]
+        return [self.items[i] for i in index.tolist()]
+
+
+#### Cached value G.samplers[key], built by build() if it is not there
+####
+
+def cached(G, key, build):
+    if key not in G.samplers:
+        G.samplers[key] = build()
+    return G.samplers[key]
+
+#### The sampler of the given kind for G (see above), from the cache of G
+####
+
+def get_sampler(G, kind):
+    return cached(G, kind, lambda: _build(G, kind))
+
+def _build(G, kind):
+    if isinstance(G, graph_tools.csr_graph):
+        nodes = np.arange(G.n)
+        degs = G.deg
+    else:
+        nodes = list(G.vertices)
+        degs = np.array([G.degrees[node] for node in nodes], dtype=np.int64)
+    if kind == 'vertex':
+        return sampler(nodes)
+    if kind == 'wedge':
+        degs = degs.astype(np.float64)
+        return sampler(nodes, degs*(degs-1)/2)
+    if kind == 'edge':
+        [src, dst] = _edge_arrays(G)
+        return _edge_sampler(src, dst)
+    if isinstance(kind, tuple) and kind[0] == 'degree':
+        members = np.flatnonzero(degs == kind[1])
+        if isinstance(nodes, np.ndarray):
+            return sampler(nodes[members])
+        return sampler([nodes[i] for i in members.tolist()])
+    raise ValueError('unknown sampler kind: ' + str(kind))
+
+# Both orientations of every edge of G, as two lists (names) or arrays (IDs)
+def _edge_arrays(G):
+    if isinstance(G, graph_tools.csr_graph):
+        src = np.repeat(np.arange(G.n), G.deg)
+        return [src, G.indices]
+    src = []
+    dst = []
+    for node in G.vertices:
+        for nbr in G.adj_list[node]:
+            src.append(node)
+            dst.append(nbr)
+    return [src, dst]
+
+# Uniform edge: a uniform position among the (oriented) edge lists. For an undirected graph, every edge is listed
+# twice, so this is a uniform edge in random orientation.
+class _edge_sampler(sampler):
+
+    def __init__(self,src,dst):
+        super(_edge_sampler,self).__init__(src)
+        self.dst = dst
+
+    def Sample(self,size=None,rng=None):
+        index = self.table.Sample(size, rng)
+        if size is None:
+            return (self.items[index], self.dst[index])
+        if isinstance(self.items, np.ndarray):
+            return list(zip(self.items[index].tolist(), self.dst[index].tolist()))
+        return [(self.items[i], self.dst[i]) for i in index.tolist()]
+
+#### G as a csr_graph (or csr_DAG for a DAG), converted once and cached
+####
+
+def csr_view(G):
+    if isinstance(G, graph_tools.csr_graph):
+        return G
+    return cached(G, 'csr', G.To_csr)
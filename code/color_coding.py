@@ -2,6 +2,8 @@ import itertools
 import sys
 import random
 from random import randint
+import numpy as np
+import triangle_counters
 
 
 
@@ -49,3 +51,30 @@ def color_vertices(G, node, color):
         return 
     else:
         G.colors[node] = color
+
+
+### multi_color_coding draws runs independent colorings at once, as the rows of a runs x n matrix, and
+### counts the colorful triangles of every coloring in one pass over the triangles of the oriented graph
+### (see triangle_counters.list_triangles). A triangle is colorful with probability 3!/27 = 2/9, so
+### 9/2 times the number of colorful triangles is an unbiased estimate of the number of triangles.
+### The output is [estimate, variance, colorful], where estimate is the average over the colorings,
+### variance is the empirical variance of that average (the variance over colorings, divided by runs),
+### and colorful is the array of colorful triangle counts. seed can be a seed or a NumPy generator.
+
+def multi_color_coding(G, runs, seed=None, block=triangle_counters.BLOCK):
+	rng = np.random.default_rng(seed)
+	D = triangle_counters.oriented(G)
+	bits = np.left_shift(1, rng.integers(0, 3, size=(runs, D.n))).astype(np.int8)	# color c is bit 1<<c, row r is coloring r
+
+	colorful = np.zeros(runs, dtype=np.int64)
+	step = max(1, block // max(runs, 1))				# triangles per step, so that a step looks at about block colors
+	for rows in triangle_counters.list_triangles(D, block=block):
+		for first in range(0, len(rows), step):
+			tri = rows[first:first+step]
+			seen = bits[:, tri[:,0]] | bits[:, tri[:,1]] | bits[:, tri[:,2]]	# colors of each triangle, for every coloring
+			colorful += np.count_nonzero(seen == 7, axis=1)				# all three colors
+
+	values = colorful*4.5
+	estimate = float(values.mean()) if runs > 0 else 0.0
+	variance = float(values.var(ddof=1))/runs if runs > 1 else float('inf')
+	return [estimate, variance, colorful]
@@ -20,16 +20,15 @@ print('Size of G: vertices = ',G_size[0],', sum of degrees = ',G_size[1],', wedg
 g_count = triangle_counters.wedge_enum(G)        # Perform wedge enumeration on G to count triangles. Note that this is three times the number of triangles.
 print('Running wedge enumeration on G, triangle count =',g_count)
 
-## Run the color coding algorithm multiple times to get an average:
-print('Running color coding and wedge enumeration on G')
-tcounts = []
-runs = input('Enter the number of runs: ') 
+## Run the color coding algorithm multiple times to get an average. All colorings are drawn at once,
+## and evaluated in one pass over the triangles of G.
+print('Running color coding on G')
+runs = int(input('Enter the number of runs: '))
+[estimate, variance, colorful] = color_coding.multi_color_coding(G, runs)
 for run in range(0,runs):
-	# Get the count for the number of triangles. For 3 random colors chosen, the number of triangles 
-	# estimated from this algorithm, is 2/9 times the actual number of triangles obtained from wedge enumeration.
-	g_colorcoding_count = color_coding.color_coding(G)      
-	print('Run = ',run, "triangleCount = ",g_colorcoding_count)
-	tcounts.append(g_colorcoding_count)
-
-#Calculate the average
-print ("Average number of triangle counts over ",run,"runs = ",sum(tcounts)*1.0/len(tcounts))
\ No newline at end of file
+	# For 3 random colors chosen, a triangle is colorful with probability 2/9, so the number of colorful
+	# triangles is about 2/9 times the actual number of triangles.
+	print('Run = ',run, "colorful triangles = ",colorful[run])
+
+#Calculate the average, scaled like wedge enumeration (three times the number of triangles)
+print ("Average triangle count estimate over ",runs,"runs = ",3*estimate,", standard error = ",3*variance**0.5)
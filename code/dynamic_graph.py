@@ -0,0 +1,115 @@
+import graph_tools
+import triangle_counters
+
+##### The dynamic_graph class is a graph (see graph_tools.py) that keeps its triangle count, the
+##### number of triangles of every vertex, and the numbers in Size() up to date as edges are added
+##### and removed. Adding or removing edge (u,v) creates or destroys exactly the triangles (u,v,w)
+##### for the common neighbors w of u and v, and changes the wedge count by the degrees of u and v,
+##### so an update costs one intersection of the two neighbor lists, instead of a recount.
+#####
+##### Graphs read with Read_edges (or copied with from_graph) are counted once from scratch with the
+##### array engine of triangle_counters.py, and are then maintained incrementally.
+
+
+class dynamic_graph(graph_tools.graph):
+
+    def __init__(self):
+        super(dynamic_graph,self).__init__()
+        self.triangles = 0           # Number of triangles
+        self.tri_vertex = dict()     # Number of triangles containing each vertex (vertices in none are left out)
+        self.sum_degrees = 0         # Sum of degrees (twice the number of edges)
+        self.wedges = 0              # Sum of {d_v \choose 2} over all vertices
+        self.tracking = True         # Whether Add_und_edge updates the counts
+
+#### Add undirected, simple edge (node1, node2), and update the counts
+####
+
+    def Add_und_edge(self,node1,node2):
+        if not self.tracking:
+            return super(dynamic_graph,self).Add_und_edge(node1,node2)
+        if node1 == node2 or self.isEdge(node1,node2):     # Nothing changes
+            return
+        self._Update(node1, node2, 1)
+        self.wedges += self.degrees.get(node1, 0) + self.degrees.get(node2, 0)    # {d+1 \choose 2} - {d \choose 2} = d
+        self.sum_degrees += 2
+        super(dynamic_graph,self).Add_und_edge(node1,node2)
+
+#### Remove undirected edge (node1, node2), if present, and update the counts
+####
+
+    def Remove_und_edge(self,node1,node2):
+        if not self.isEdge(node1,node2):
+            return
+        super(dynamic_graph,self).Remove_und_edge(node1,node2)
+        self.wedges -= self.degrees[node1] + self.degrees[node2]      # Degrees are already decremented
+        self.sum_degrees -= 2
+        self._Update(node1, node2, -1)
+
+# Add sign times the triangles of edge (node1, node2), that is, one for each common neighbor
+    def _Update(self,node1,node2,sign):
+        nbrs1 = self.adj_list.get(node1)
+        nbrs2 = self.adj_list.get(node2)
+        if not (nbrs1 and nbrs2):
+            return
+        common = nbrs1 & nbrs2
+        if not common:
+            return
+        self.triangles += sign*len(common)
+        tri_vertex = self.tri_vertex
+        for node in (node1, node2):
+            tri_vertex[node] = tri_vertex.get(node, 0) + sign*len(common)
+        for node in common:
+            tri_vertex[node] = tri_vertex.get(node, 0) + sign
+        if sign < 0:
+            for node in [node1, node2] + list(common):     # Drop vertices left in no triangle
+                if tri_vertex[node] == 0:
+                    del tri_vertex[node]
+
+#### Read edges as graph.Read_edges does, and count everything once
+####
+
+    def Read_edges(self,fname,sep=None,bulk=False,cache=False,intern=False,workers=1):
+        self.tracking = False
+        try:
+            super(dynamic_graph,self).Read_edges(fname,sep,bulk,cache,intern,workers)
+        finally:
+            self.tracking = True
+        self.Recount()
+
+#### Recompute all counts from scratch
+####
+
+    def Recount(self):
+        [nodes, indptr, indices] = self._Csr_arrays()
+        [D, tri_vertex, tri_edge] = triangle_counters.triangle_arrays(graph_tools.csr_graph(indptr, indices, nodes))
+        self.triangles = int(tri_vertex.sum())//3
+        self.tri_vertex = dict((D.labels[v], t) for (v, t) in enumerate(tri_vertex.tolist()) if t > 0)
+        self.sum_degrees = sum(self.degrees.values())
+        self.wedges = sum(d*(d-1)//2 for d in self.degrees.values())
+
+#### Same output as graph.Size, without the loop over vertices
+####
+
+    def Size(self):
+        return [len(self.vertices), self.sum_degrees, self.wedges]
+
+#### Number of triangles (of vertex node, if it is given)
+####
+
+    def Triangles(self,node=None):
+        if node is None:
+            return self.triangles
+        return self.tri_vertex.get(node, 0)
+
+
+#### Copy of the graph G as a dynamic_graph
+####
+
+def from_graph(G):
+    output = dynamic_graph()
+    output.vertices = set(G.vertices)
+    output.adj_list = dict((node, set(G.adj_list[node])) for node in G.vertices)
+    output.degrees = dict((node, len(output.adj_list[node])) for node in G.vertices)
+    output.labels = G.labels
+    output.Recount()
+    return output
@@ -2,7 +2,9 @@ import itertools
 import sys
 import random
 from random import randint
+import numpy as np
 import graph_tools
+import triangle_counters
 
 ### This module sparsifies the graph by sampling edges based on an input probability 'p'. 
 ### With this spasified graph as input, the number of triangles are estimated by wedge 
@@ -32,12 +34,12 @@ def sparsify_graph(G, p):
         neighbors = G.adj_list[node1]            # Get all neighbors of node1
         for eachneighbor in neighbors:
             # if the processed_edges dictionary has the entry for edge (node1, eachneighbor) or (eachneighbor, node1)
-            if(processed_edges.has_key((node1, eachneighbor)) or processed_edges.has_key((eachneighbor,node1))):
-                if(processed_edges.has_key((node1, eachneighbor))):
-                    if not processed_edges.has_key((eachneighbor, node1)):
+            if((node1, eachneighbor) in processed_edges or (eachneighbor,node1) in processed_edges):
+                if((node1, eachneighbor) in processed_edges):
+                    if (eachneighbor, node1) not in processed_edges:
                         processed_edges[(eachneighbor, node1)] = 1
                 else:
-                    if not processed_edges.has_key((eachneighbor, node1)):
+                    if (eachneighbor, node1) not in processed_edges:
                         processed_edges[(node1, eachneighbor)] = 1 
 
             else:
@@ -53,5 +55,55 @@ def sparsify_graph(G, p):
                     G_sparse.Add_und_edge(node1,eachneighbor)
                     G_sparse.Add_und_edge(eachneighbor,node1)
 
-    print "number of edges in the sparse graph = ", numedges
-    return G_sparse
\ No newline at end of file
+    print("number of edges in the sparse graph = ", numedges)
+    return G_sparse
+
+
+#### Nested sparsifiers: every undirected edge e gets one uniform value r_e in [0,1), and the sparsifier for p keeps
+#### the edges with r_e < p. This is the same distribution as sparsify_graph(G, p), but the sparsifiers for all p come
+#### from one draw, and the sparsifier for p is contained in the one for any larger p. A triangle is in the
+#### sparsifier for p iff the largest value of its 3 edges is below p, so one pass over the triangles of G (on the
+#### oriented csr_DAG, see triangle_counters.py) counts the triangles T_p of every sparsifier, without building any.
+####
+#### T_p/p^3 is an unbiased estimate of the number of triangles T. Its variance is T(1/p^3 - 1) + K(1/p - 1), where
+#### K = sum over edges e of t_e(t_e - 1) counts the ordered pairs of triangles that share an edge (t_e is the
+#### number of triangles on e). The variance is estimated with T_p/p^3 for T and K_p/p^5 for K, where K_p is
+#### the same sum on the sparsifier.
+####
+#### probs: list of probabilities in (0, 1]. Output is a list with one tuple (p, edges, triangles, estimate, variance)
+#### per probability, in the given order, where edges and triangles are the sizes of the sparsifier for p.
+
+def nested_sparsify(G, probs, seed=None, block=triangle_counters.BLOCK):
+    ps = np.asarray(probs, dtype=np.float64)
+    if len(ps) == 0 or ps.min() <= 0 or ps.max() > 1:
+        raise ValueError('probabilities must be in (0, 1]')
+    order = np.sort(ps)
+    P = len(order)
+
+    D = triangle_counters.oriented(G)
+    m = len(D.indices)
+    rng = np.random.default_rng(seed)
+    r = rng.random(m)                             # One value per undirected edge (an out-edge of D)
+
+    # A triangle with largest value x is in the sparsifiers order[j:], for j = searchsorted(order, x, 'right').
+    # Count the triangles of each first sparsifier j, overall and on each edge (row e of on_edge).
+    first = np.zeros(P+1, dtype=np.int64)
+    on_edge = np.zeros((m, P+1), dtype=np.int64)
+    for [e_uv, e_uw, e_vw] in triangle_counters.triangle_blocks(D, block=block):
+        j = np.searchsorted(order, np.maximum(np.maximum(r[e_uv], r[e_uw]), r[e_vw]), side='right')
+        first += np.bincount(j, minlength=P+1)
+        for e in (e_uv, e_uw, e_vw):
+            np.add.at(on_edge, (e, j), 1)
+
+    triangles = np.cumsum(first[:P])              # T_p for p = order[0], order[1],...
+    t_e = np.cumsum(on_edge[:, :P], axis=1)       # t_e on every sparsifier
+    pairs = np.sum(t_e*(t_e - 1), axis=0)         # K_p
+    edges = np.searchsorted(np.sort(r), order, side='left')    # Number of r_e < p
+
+    output = []
+    for p in ps.tolist():
+        j = int(np.searchsorted(order, p))
+        est = triangles[j]/p**3
+        variance = est*(1/p**3 - 1) + pairs[j]/p**5*(1/p - 1)
+        output.append((p, int(edges[j]), int(triangles[j]), float(est), float(variance)))
+    return output
@@ -1,81 +1,131 @@
-
 import numpy as np
 from numpy import linalg as LA
-import copy
+import scipy.sparse as sp
+from scipy.sparse import linalg as sla
 import time
+import graph_tools
 
+BLOCK = 1<<24       # Bound on the number of nonzeros of A[rows]*A held at once by trace_triangle_count
+MAX_K = 80          # Default bound on the number of eigenvalues computed by eigen_triangle
+DENSE_MAX = 1<<13   # Largest n for which eigen_val builds the dense n x n matrix (8 bytes per entry)
 
-def trace_triangle_count(G):
-    #Need to add function to convert
-    #Adj list to Adj matrix in Numpy form    
 
-    #Create Empty Matrix
-    adjMatrix_G = []
-    
-    #Hold the keys into a set list
-    keys = G.adj_list.keys()    
-    #Create a template for the row to fill the links
-    blank_row = np.zeros(len(keys))
-    #Iterate through the keys
-    for node in keys:
-        #Create a new row for elem node
-        temp = copy.deepcopy(blank_row)
-        #Iterate through the elems list of edges
-        for node2 in G.adj_list[node]:
-            #For each node2 in the edge list of node
-            #Place a 1 at their location within temp
-            temp.put(keys.index(node2), 1)
-        #Add temp to the matrix
-        adjMatrix_G.append(temp)
-    #Find the eigenvalues for the matrix
-    #After the matrix is turned into an np matrix
-    adjMatrix_G = np.matrix(adjMatrix_G)
-    start = time.time()
-    #Calculate the matrix cubed
-    adjMatrix_G = adjMatrix_G*adjMatrix_G*adjMatrix_G
+def adjacency_matrix(G):
+    #Sparse (CSR) adjacency matrix of G, where row i is vertex i of G.To_csr()
+    #(or of G itself, if it is already a csr_graph). Output is [A, labels],
+    #where labels[i] is the name of vertex i (None means the names are 0,...,n-1)
+    if not isinstance(G, graph_tools.csr_graph):
+        G = G.To_csr()
+    n = len(G.indptr) - 1
+    data = np.ones(len(G.indices), dtype=np.int64)
+    A = sp.csr_matrix((data, G.indices, G.indptr), shape=(n, n))
+    return [A, G.labels]
 
-    #Find the trace of the cubed matrix
-    trace = np.trace(adjMatrix_G)
+def trace_triangle_count(G):
+    #Build the sparse adjacency matrix
+    A = adjacency_matrix(G)[0]
+    start = time.time()
+    #trace(A^3) is the sum over edges (i,j) of (A^2)[i,j], that is sum((A*A) o A).
+    #Compute it over blocks of rows, so that A[rows]*A is never too big.
+    #Row i of A*A has at most sum of the degrees of i's neighbors nonzeros.
+    degrees = np.diff(A.indptr)
+    row_bound = np.cumsum(A.dot(degrees))
+    trace = 0
+    first = 0
+    n = A.shape[0]
+    while first < n:
+        #Take rows until the bound on the nonzeros reaches BLOCK (at least one row)
+        base = row_bound[first-1] if first > 0 else 0
+        last = max(first+1, int(np.searchsorted(row_bound, base + BLOCK, side='right')))
+        rows = A[first:last]
+        trace += int(rows.dot(A).multiply(rows).sum())
+        first = last
     end = time.time()
     print("Time to calculate trace: " + str(end-start))
     return trace/2
 
 def eigen_val(G):
-    #Need to add function to convert
-    #Adj list to Adj matrix in Numpy form    
-    #adjMatrix_G = G.convert_to_matrix() 
-
-    #Create Empty Matrix
+    #Build the sparse adjacency matrix
     start = time.time()
-    adjMatrix_G = []
-    
-    #Hold the keys into a set list
-    keys = G.adj_list.keys()    
-    #Create a template for the row to fill the links
-    blank_row = np.zeros(len(keys))
-    #Iterate through the keys
-    for node in keys:
-        #Create a new row for elem node
-        temp = copy.deepcopy(blank_row)
-        #Iterate through the elems list of edges
-        for node2 in G.adj_list[node]:
-            #For each node2 in the edge list of node
-            #Place a 1 at their location within temp
-            temp.put(keys.index(node2), 1)
-        #Add temp to the matrix
-        adjMatrix_G.append(temp)
-    #Find the eigenvalues for the matrix
-    #After the matrix is turned into an np matrix
-    adjMatrix_G = np.matrix(adjMatrix_G)
+    A = adjacency_matrix(G)[0]
     end = time.time()
     print("Time to make Adjacency Matrix: " + str(end-start))
+    #The full spectrum needs the dense matrix, which is O(n^2) memory. Larger
+    #graphs should use eigen_triangle (top eigenvalues only) or
+    #trace_triangle_count (exact, sparse).
+    n = A.shape[0]
+    if n > DENSE_MAX:
+        raise ValueError('eigen_val needs a dense %d x %d matrix (DENSE_MAX = %d); use eigen_triangle to estimate, '
+                         'or trace_triangle_count for the exact count' % (n, n, DENSE_MAX))
     start = time.time()
-    eigVals = LA.eigvals(adjMatrix_G)
-    eig_sum = 0.0
-    
-    for eig in eigVals:
-        eig_sum += np.power(eig,3)
-    end = time.time()    
+    #A is symmetric, so use eigvalsh
+    eigVals = LA.eigvalsh(A.toarray().astype(np.float64))
+    eig_sum = np.sum(eigVals**3)
+    end = time.time()
     print("Time to calculate eigen sum: " + str(end-start))
 
-    return eig_sum / 2
\ No newline at end of file
+    return eig_sum / 2
+
+def eigen_triangle(G, k=10, tol=0.001, max_k=MAX_K):
+    #EigenTriangle: the sum of cubes of the eigenvalues is trace(A^3), and it
+    #is dominated by the few eigenvalues of largest magnitude. Compute the top
+    #k of them with Lanczos (eigsh), and double k until the cube of the
+    #smallest one is at most tol times the sum so far, or k reaches max_k.
+    #Each round costs more than the last, so max_k bounds the time: graphs
+    #with flat spectra would need most of the eigenvalues, and then the
+    #estimate is not converged. Once k reaches n-1, the full spectrum is
+    #computed instead (eigen_val), which is exact; this needs n <= DENSE_MAX,
+    #and larger graphs stop at k = n-2.
+    #Output is (estimate, k, trace, converged). As for eigen_val, the
+    #estimate is sum/2 = 3 * number of triangles. trace has one
+    #(k, estimate, ratio) tuple per round, where ratio is
+    #|last cube| / |sum of cubes|.
+    A = adjacency_matrix(G)[0].astype(np.float64)
+    n = A.shape[0]
+    if max_k is None:
+        max_k = n - 1
+    max_k = min(max_k, n - 1 if n <= DENSE_MAX else n - 2)
+    k = max(1, min(k, max_k))
+    trace = []
+    while True:
+        if k >= n - 1:      #eigsh needs k < n, and misses one eigenvalue at k = n-1
+            eig_sum = eigen_val(G) * 2
+            trace.append((n, eig_sum / 2, 0.0))
+            return (eig_sum / 2, n, trace, True)
+        start = time.time()
+        eigVals = sla.eigsh(A, k=k, which='LM', return_eigenvectors=False)
+        cubes = eigVals**3
+        eig_sum = np.sum(cubes)
+        #The eigenvalue of smallest magnitude found is the last to contribute
+        ratio = np.min(np.abs(cubes)) / max(abs(eig_sum), 1e-300)
+        trace.append((k, eig_sum / 2, ratio))
+        end = time.time()
+        print("Lanczos with k = " + str(k) + ": estimate " + str(eig_sum / 2) + ", ratio " + str(ratio) + ", time " + str(end-start))
+        if ratio <= tol:
+            return (eig_sum / 2, k, trace, True)
+        if k >= max_k:
+            print("EigenTriangle did not converge: ratio " + str(ratio) + " > tol " + str(tol) + " at max_k = " + str(max_k))
+            return (eig_sum / 2, k, trace, False)
+        k = min(2*k, max_k)
+
+def hutchinson_triangle(G, block=32, max_probes=4096, rel_err=0.05, z=1.96, seed=None):
+    #Hutchinson estimator of trace(A^3)/6, the number of triangles. For a
+    #random +-1 vector x, x^T A^3 x = (Ax)^T A (Ax) has expectation trace(A^3).
+    #Probes are drawn block at a time as the columns of an n x block matrix X,
+    #so each round is two sparse matrix-matrix products. Stop when the
+    #confidence interval (z standard errors) is within rel_err of the
+    #estimate, or after max_probes probes.
+    #Output is (estimate, (low, high), probes).
+    A = adjacency_matrix(G)[0].astype(np.float64)
+    n = A.shape[0]
+    rng = np.random.default_rng(seed)
+    samples = []
+    while True:
+        X = rng.integers(0, 2, size=(n, block)).astype(np.float64)*2 - 1     #Rademacher probes
+        Y = A.dot(X)
+        samples.append(np.einsum('ij,ij->j', Y, A.dot(Y)) / 6)      #One sample of trace(A^3)/6 per probe
+        values = np.concatenate(samples)
+        estimate = np.mean(values)
+        half = z*np.std(values, ddof=1)/np.sqrt(len(values)) if len(values) > 1 else np.inf
+        if half <= rel_err*abs(estimate) or len(values) >= max_probes:
+            return (estimate, (estimate - half, estimate + half), len(values))
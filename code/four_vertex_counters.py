@@ -15,42 +15,32 @@ import numpy as np
 #### 
 
 def four_vertex_count(G):
-    order = G.DegenOrdering()   # Get degeneracy ordering
-    DG = G.Orient(order)        # DG is digraph with this orientation
+    [DG, tri_vertex, tri_edge] = triangle_counters.triangle_arrays(G)   # Degeneracy orientation (as a csr_DAG) and triangle info
     print('Got degeneracy orientation')
-    
-    tri_info = triangle_counters.triangle_info(DG) # Get triangle info
     print('Got triangle information')
- 
-    triangle = sum(tri_info[0].values())/3     # Sum of per-vertex triangle counts is 3 times the total triangle count
-    
-    star_3 = 0.0
-    path_3 = 0.0
-    tailed_triangle = 0.0
+
+    out_lists = [DG.indices[DG.indptr[node]:DG.indptr[node+1]].tolist() for node in range(DG.n)]   # Out-lists, sorted by topological order
+    out_sets = [set(nbrs) for nbrs in out_lists]
+
+    triangle = int(tri_vertex.sum())/3.0    # Sum of per-vertex triangle counts is 3 times the total triangle count
+
+    deg = (DG.deg + DG.indeg).astype(np.float64)       # Degrees in G are out-degree plus in-degree
+    star_3 = float(np.sum(deg*(deg-1)*(deg-2)/6))           # Number of 3-stars = \sum_v {d_v \choose 3}
+    tailed_triangle = float(np.sum((deg-2)*tri_vertex))     # Number of tailed triangles hinged at v = (d_v-2)*t_v
+
+    # Every edge of G appears once in DG, from src to DG.indices
+    src = np.repeat(np.arange(DG.n), DG.deg)
+    path_3 = float(np.sum((deg[src]-1)*(deg[DG.indices]-1)))   # Number of 3-paths involving edge (u,v) = (d_u-1)(d_v-1)
+    chordal_cycle = float(np.sum(tri_edge*(tri_edge-1)/2))   # Number of chordal-cycles hinged at edge e = {t_e \choose 2}
+
+    # After this correction each triangle is counted thrice as a 3-path
+    path_3 = path_3 - 3*triangle
+
     cycle_4 = 0.0
-    chordal_cycle = 0.0
     clique_4 = 0.0
-    
+
     debug = 0
-     
-    for node in G.vertices:     
-        deg = G.degrees[node]
-        tri = tri_info[0][node]
-        star_3 += deg*(deg-1)*(deg-2)/6    # Number of 3-stars = \sum_v {d_v \choose 3} 
-        tailed_triangle += (deg-2)*tri      # Number of tailed triangles hinged at v = (d_v-2)*t_v
-        
-        for nbr in G.adj_list[node]:             # Loop over neighbors of node
-            deg_nbr = G.degrees[nbr]
-            path_3 += (deg-1)*(deg_nbr-1)  # Number of 3-paths involving edge (node,nbr) = (deg-1)(deg_nbr-1)
-            tri_edge = tri_info[1][(node,nbr)]
-            chordal_cycle += tri_edge*(tri_edge-1)/2 # Number of chordal-cycles hinged at edge e = {d_e \choose 2}
-    
-    # Previous code counts each 3-path twice because each edge appears twice in loop. After this correction
-    # each triangle is counted thrice as a 3-path
-    path_3 = path_3/2 - 3*triangle        
-    
-    # Previous code counts each chordal-cycle twice because each edge appears twice in loop.
-    chordal_cycle = chordal_cycle/2
+
     print('Computed everything but 4-cycles and 4-cliques')
 
     wedge_outout = {}       # Hash tables for storing wedges
@@ -68,7 +58,7 @@ def four_vertex_count(G):
 
     for node in DG.vertices:
         # First we index out-out wedges centered at node
-        for (nbr1, nbr2) in itertools.combinations(DG.adj_list[node],2):    #Loop over all pairs of neighbors of node1
+        for (nbr1, nbr2) in itertools.combinations(out_lists[node],2):    #Loop over all pairs of neighbors of node1
             if nbr1 > nbr2:     # If nbr1 > nbr2, swap, so that nbr1 \leq nbr2
                 tmp = nbr1
                 nbr1 = nbr2
@@ -86,8 +76,8 @@ def four_vertex_count(G):
 
     for node in DG.vertices:
         endpoints = {}
-        for nbr1 in DG.adj_list[node]:
-            for nbr2 in DG.adj_list[nbr1]:       # Get in-out wedge with source at node
+        for nbr1 in out_lists[node]:
+            for nbr2 in out_lists[nbr1]:       # Get in-out wedge with source at node
                 inout += 1
                 if nbr2 in endpoints:
                     endpoints[nbr2] += 1
@@ -128,28 +118,21 @@ def four_vertex_count(G):
 
     clique_work = 0.0
     for node in DG.vertices:        # Loop over nodes
-        nbrs = DG.adj_list[node]
-        nbrs_info = []
-        for cand in nbrs:           # Get topological order position for each cand in nbrs
-            nbrs_info.append((cand,DG.top_order_inv[cand]))
-
-        sorted_nbrs = sorted(nbrs_info, key=lambda entry: entry[1])   # Sort nbrs according to position in topological ordering
+        sorted_nbrs = out_lists[node]   # Out-neighbors, already sorted by position in topological ordering
 
         deg = len(sorted_nbrs)      # Out-degree of node
         for i in range(0,deg):      # Loop over neighbors in sorted order
-            nbri = sorted_nbrs[i][0]
-            
-            # Get all vertices nbrj > nbri that form triangle with nbri
-            tri_end = [] 
-            for j in range(i+1,deg):   # Loop over tuple of neighbors i < j
-                nbrj = sorted_nbrs[j][0]
-                if G.isEdge(nbri,nbrj):
-                    tri_end.append(nbrj)  # nbrj forms triangle with (node,nbri)
+            nbri = sorted_nbrs[i]
+            nbri_out = out_sets[nbri]
+
+            # Get all vertices nbrj > nbri that form triangle with nbri. As nbrj is after nbri in the ordering,
+            # the edge can only be (nbri,nbrj).
+            tri_end = [nbrj for nbrj in sorted_nbrs[i+1:] if nbrj in nbri_out]
 
             # Now look for edges among pairs in tri_end, to find 4-cliques
             for (v1, v2) in itertools.combinations(tri_end,2):
                 clique_work += 1
-                if G.isEdge(v1,v2):
+                if v2 in out_sets[v1]:
                     clique_4 += 1
 
     print('Got cliques. Searched over',clique_work,'tuples')
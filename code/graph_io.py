@@ -0,0 +1,449 @@
+import os
+import re
+import bz2
+import gzip
+import json
+import lzma
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+try:
+    import fcntl
+except ImportError:         # Not POSIX: cache builds are not serialized, but still installed atomically
+    fcntl = None
+
+##### This file contains fast readers for edge files, in the same format as graph.Read_edges:
+#####
+##### node1 sep node2 sep <anything else>
+#####
+##### with lines starting with '#' treated as comments. Instead of inserting edges one at a time into
+##### a dict of sets, the file is parsed in large chunks into NumPy arrays. Self loops and duplicate
+##### (or reciprocal) edges are dropped with array operations, and the result is a CSR adjacency
+##### structure (see csr_graph in graph_tools.py) that can be turned into a graph in one shot.
+#####
+##### Files ending in .gz, .bz2 or .xz are decompressed on the fly. Uncompressed files can be split at
+##### line boundaries and parsed by a pool of processes (the workers argument).
+
+
+CHUNK_BYTES = 1 << 24       # Approximate number of bytes parsed at a time
+MIN_CHUNK_BYTES = 1 << 20   # Smallest chunk that a parallel read splits a file into
+COMMENT = re.compile(r'^[ \t]*#.*\n?', re.MULTILINE)     # A line whose first non-blank character is '#'
+
+
+#### Smallest integer type that holds vertex IDs 0,...,n-1
+####
+
+def index_dtype(n):
+    if n < 2**31:
+        return np.int32
+    return np.int64
+
+#### Parse a block of text (whole lines) into the first two tokens of each edge line. Output is a flat
+#### list [u1, v1, u2, v2, ...] of token strings and the number of edge lines (lines with at least two tokens).
+####
+
+def parse_text(text, sep=None):
+    if '#' in text:
+        text = COMMENT.sub('', text)    # Remove comment lines
+    body = text.splitlines()
+    if sep is None:
+        counts = list(map(len, map(str.split, body)))
+        if counts.count(2) == len(body):        # Common case, every line is exactly "node1 node2"
+            return text.split(), len(body)
+        rows = [line.split(None, 2) for line in body]
+    else:
+        pattern = re.compile(sep)
+        rows = [pattern.split(line.strip(), 2) for line in body]
+    tokens = []
+    for row in rows:
+        if len(row) >= 2:               # Lines with fewer than two tokens are not edges
+            tokens.append(row[0])
+            tokens.append(row[1])
+    return tokens, len(tokens)//2
+
+#### Open an edge file for reading text, decompressing according to the extension
+####
+
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+def is_compressed(fname):
+    return os.path.splitext(fname)[1] in OPENERS
+
+def open_edge_file(fname):
+    opener = OPENERS.get(os.path.splitext(fname)[1])
+    if opener is None:
+        return open(fname, 'r')
+    return opener(fname, 'rt')
+
+# Turn parsed tokens into [u, v, raw], dropping self loops
+def _token_arrays(text, sep):
+    tokens, raw = parse_text(text, sep)
+    tokens = np.array(tokens, dtype=str)
+    u = tokens[0::2]
+    v = tokens[1::2]
+    keep = u != v                   # Drop self loops
+    return [u[keep], v[keep], raw]
+
+#### Generator over the edges of file fname, in chunks of roughly chunk_bytes bytes. Each chunk is
+#### [u, v, raw], where u and v are NumPy arrays of vertex names (strings) of the non-self-loop edges,
+#### and raw is the number of edge lines in the chunk (including self loops).
+####
+
+def read_edge_chunks(fname, sep=None, chunk_bytes=CHUNK_BYTES):
+    for text in _text_chunks(fname, chunk_bytes):
+        yield _token_arrays(text, sep)
+
+# Blocks of whole lines of fname, of roughly chunk_bytes bytes
+def _text_chunks(fname, chunk_bytes):
+    with open_edge_file(fname) as f_input:
+        while True:
+            text = f_input.read(chunk_bytes)
+            if not text:
+                break
+            text += f_input.readline()      # Finish the last line, so chunks split at line boundaries
+            yield text
+
+#### Parse a block of text (whole lines) and intern the names in it. Output is [names, u, v, raw], where names
+#### is the sorted array of the distinct names in the block, (names[u[i]], names[v[i]]) are its non-self-loop
+#### edges, and raw is the number of edge lines. If every name is an integer in plain decimal form (as in
+#### the SNAP files), names is an int64 array. Those are much faster to build, sort and merge than strings.
+####
+
+POW10 = 10**np.arange(1, 19, dtype=np.int64)       # Powers of 10 that fit in an int64, to count digits
+
+def intern_text(text, sep=None):
+    tokens, raw = parse_text(text, sep)
+    names = None
+    if text.isascii() and all(map(str.isdigit, tokens)):
+        try:
+            values = np.array(tokens, dtype=np.int64)
+        except (ValueError, OverflowError):
+            values = None
+        # Each token is at least as long as the digits of its value, so equal totals mean no leading zeros
+        if values is not None and sum(map(len, tokens)) == len(values) + int(np.searchsorted(POW10, values, side='right').sum()):
+            names, ids = np.unique(values, return_inverse=True)
+    if names is None:
+        names, ids = np.unique(np.array(tokens, dtype=str), return_inverse=True)
+    ids = ids.reshape(-1)
+    u = ids[0::2]
+    v = ids[1::2]
+    keep = u != v                   # Drop self loops
+    return [names, u[keep], v[keep], raw]
+
+#### Split the (uncompressed) file fname into byte ranges [start, end) of about chunk_bytes bytes,
+#### where every range begins at the start of a line.
+####
+
+def split_file(fname, chunk_bytes=CHUNK_BYTES):
+    size = os.path.getsize(fname)
+    bounds = [0]
+    with open(fname, 'rb') as f_input:
+        while bounds[-1] < size:
+            f_input.seek(bounds[-1] + chunk_bytes)
+            f_input.readline()              # Move to the start of the next line
+            bounds.append(min(f_input.tell(), size))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# Parse one byte range of a file. This runs in the worker processes of read_edge_chunks_parallel.
+def _read_range(args):
+    (fname, sep, start, end) = args
+    with open(fname, 'rb') as f_input:
+        f_input.seek(start)
+        text = f_input.read(end-start).decode('utf-8')
+    return _token_arrays(text, sep)
+
+# Same, but the text is interned (see intern_text)
+def _read_range_interned(args):
+    (fname, sep, start, end) = args
+    with open(fname, 'rb') as f_input:
+        f_input.seek(start)
+        text = f_input.read(end-start).decode('utf-8')
+    return intern_text(text, sep)
+
+#### Same as read_edge_chunks, but the chunks are parsed by a pool of workers processes. Files are split into
+#### at least 4 chunks per worker (of at least MIN_CHUNK_BYTES bytes), so that small files are spread over the
+#### pool too. With intern=True, the chunks are interned by the workers, as [names, u, v, raw] (see intern_text).
+#### Compressed files cannot be split, so they are read by read_edge_chunks.
+####
+
+def read_edge_chunks_parallel(fname, sep=None, workers=None, chunk_bytes=CHUNK_BYTES, intern=False):
+    if is_compressed(fname) or workers == 1:
+        for text in _text_chunks(fname, chunk_bytes):
+            yield intern_text(text, sep) if intern else _token_arrays(text, sep)
+        return
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    chunk_bytes = max(MIN_CHUNK_BYTES, min(chunk_bytes, os.path.getsize(fname)//(4*workers) + 1))
+    ranges = [(fname, sep, start, end) for (start, end) in split_file(fname, chunk_bytes)]
+    pool = multiprocessing.Pool(workers)
+    try:
+        for chunk in pool.imap(_read_range_interned if intern else _read_range, ranges):
+            yield chunk
+    finally:
+        pool.terminate()
+
+#### Read all edges of fname into integer arrays. Vertex names are interned into 0,1,...,n-1.
+#### Output is [src, dst, labels, raw_edges], where (labels[src[i]], labels[dst[i]]) are the distinct
+#### undirected edges, each listed once with src[i] < dst[i], and raw_edges is the number of edge lines.
+#### Vertex IDs follow the sorted order of the names: numeric order if every name is an integer (see
+#### intern_text), and string order otherwise. labels is an array of strings either way.
+#### With workers > 1 (or None, for all cores), the file is parsed and interned in parallel, and only
+#### the distinct names of each chunk are merged here.
+####
+
+def read_edge_arrays(fname, sep=None, workers=1):
+    chunks = list(read_edge_chunks_parallel(fname, sep, workers, intern=True))
+    numeric = all(names.dtype.kind == 'i' for [names, u, v, raw] in chunks)
+    parts = [names if numeric or names.dtype.kind != 'i' else _int_labels(names) for [names, u, v, raw] in chunks]
+    labels = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=str)
+    us = []
+    vs = []
+    raw_edges = 0
+    for (part, [names, u, v, raw]) in zip(parts, chunks):
+        remap = np.searchsorted(labels, part)           # IDs of the chunk to IDs of the file
+        us.append(remap[u])
+        vs.append(remap[v])
+        raw_edges += raw
+    if numeric:
+        labels = _int_labels(labels)
+    u = np.concatenate(us) if us else np.zeros(0, dtype=np.int64)
+    v = np.concatenate(vs) if vs else np.zeros(0, dtype=np.int64)
+    src, dst = dedup_edges(u, v, len(labels))
+    return [src, dst, labels, raw_edges]
+
+# Sorted integer names as strings, no wider than the longest (the largest, or a negative one)
+def _int_labels(names):
+    if len(names) == 0:
+        return np.zeros(0, dtype=str)
+    return names.astype('U%d' % max(len(str(names[0])), len(str(names[-1]))))
+
+#### Remove duplicate and reciprocal copies from the edge list (u[i], v[i]) on vertices 0,...,n-1.
+#### Output is [src, dst] with src < dst, sorted by (src, dst).
+####
+
+def dedup_edges(u, v, n):
+    u = np.asarray(u, dtype=np.int64)
+    v = np.asarray(v, dtype=np.int64)
+    lo = np.minimum(u, v)
+    hi = np.maximum(u, v)
+    keep = lo != hi
+    keys = np.unique(lo[keep]*n + hi[keep])       # Each undirected edge becomes a single key
+    return [keys // n, keys % n]
+
+#### Build the symmetric CSR arrays [indptr, indices] of the undirected graph with edges (src[i], dst[i])
+#### on vertices 0,...,n-1. The edges should be distinct. Neighbor lists are sorted.
+####
+
+def edges_to_csr(src, dst, n):
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    keys = np.sort(np.concatenate((src*n + dst, dst*n + src)))     # Both directions, sorted by (row, column)
+    indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+    return [indptr, (keys % n).astype(index_dtype(n))]
+
+#### Read fname directly into CSR arrays. Output is [indptr, indices, labels, raw_edges].
+####
+
+def read_csr_arrays(fname, sep=None, workers=1):
+    [src, dst, labels, raw_edges] = read_edge_arrays(fname, sep, workers)
+    [indptr, indices] = edges_to_csr(src, dst, len(labels))
+    return [indptr, indices, labels, raw_edges]
+
+#### Binary cache. The CSR arrays of fname are stored as .npy files in a directory, together with the size and
+#### modification time of fname. Later reads memory-map the arrays, so they start almost instantly, and processes
+#### reading the same graph share the pages. The cache is rebuilt whenever fname (or sep) changes.
+####
+#### Every build goes into a new directory fname+CACHE_SUFFIX+'.XXXX', and fname+CACHE_SUFFIX is a symlink to the
+#### current one. A build is installed by atomically replacing the symlink (os.replace), so any number of processes
+#### can read the cache while it is rebuilt: readers see either the old or the new version, never a mix, and a reader
+#### whose version is removed under it just reads the new one. The replaced version is then removed. (A
+#### plain directory fname+CACHE_SUFFIX, from older versions of this file, is still read, and replaced when stale.)
+####
+
+CACHE_SUFFIX = '.csr'
+CACHE_ARRAYS = ['indptr', 'indices', 'labels']
+CACHE_RETRIES = 5           # Attempts of read_cached_csr, when the cache keeps changing under it
+
+# Identity of the edge file that the cache was built from
+def _cache_stamp(fname, sep):
+    stat = os.stat(fname)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'sep': sep}
+
+def _cache_valid(cache, stamp):
+    try:
+        with open(os.path.join(cache, 'meta.json'), 'r') as f_meta:
+            meta = json.load(f_meta)
+    except (IOError, OSError, ValueError):
+        return None
+    if any(meta.get(key) != stamp[key] for key in stamp):
+        return None
+    if not all(os.path.exists(os.path.join(cache, name+'.npy')) for name in CACHE_ARRAYS):
+        return None
+    return meta
+
+#### Write the cache of fname into a new version directory, and install it. Builds of the same cache are serialized
+#### by a lock on fname+CACHE_SUFFIX+'.lock', so concurrent processes do not build it twice. With force=False, the
+#### cache is only built if it is still missing or stale once the lock is held. Output is [version, meta], where
+#### version is the directory of the cache and meta is its stamp.
+####
+
+def write_csr_cache(fname, sep=None, workers=1, force=True):
+    cache = fname + CACHE_SUFFIX
+    with open(cache + '.lock', 'a') as f_lock:
+        if fcntl is not None:
+            fcntl.flock(f_lock, fcntl.LOCK_EX)          # Released when the file is closed
+        stamp = _cache_stamp(fname, sep)
+        if not force:
+            version = os.path.realpath(cache)
+            meta = _cache_valid(version, stamp)
+            if meta is not None:                        # Built by another process while we waited
+                return [version, meta]
+        [indptr, indices, labels, raw_edges] = read_csr_arrays(fname, sep, workers)
+        stamp['raw_edges'] = raw_edges
+        version = tempfile.mkdtemp(prefix=os.path.basename(cache)+'.', dir=os.path.dirname(os.path.abspath(cache)))
+        try:
+            for (name, array) in zip(CACHE_ARRAYS, [indptr, indices, labels]):
+                np.save(os.path.join(version, name+'.npy'), array)
+            with open(os.path.join(version, 'meta.json'), 'w') as f_meta:
+                json.dump(stamp, f_meta)
+            _install_cache(cache, version)
+        except BaseException:
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+    return [version, stamp]
+
+# Point the symlink cache to the directory version, and remove the version it pointed to before
+def _install_cache(cache, version):
+    link = version + '.link'
+    os.symlink(os.path.basename(version), link)     # Relative, so the graphs directory can move
+    try:
+        old = os.readlink(cache) if os.path.islink(cache) else None
+        if old is None and os.path.isdir(cache):
+            _remove_dir(cache, version + '.old')    # Cache directory of the old layout
+        os.replace(link, cache)                     # Atomic, even if another process just installed its own version
+    finally:
+        if os.path.lexists(link):
+            os.remove(link)
+    if old is not None and old != os.path.basename(version):
+        shutil.rmtree(os.path.join(os.path.dirname(cache), old), ignore_errors=True)
+
+# Remove the directory path, by first renaming it to aside. Another process may have removed it already.
+def _remove_dir(path, aside):
+    try:
+        os.rename(path, aside)
+    except OSError:
+        return
+    shutil.rmtree(aside, ignore_errors=True)
+
+#### Read fname into CSR arrays through the cache, building it first if it is missing or stale.
+#### Output is [indptr, indices, labels, raw_edges], where the arrays are read-only memory maps.
+####
+
+def read_cached_csr(fname, sep=None, workers=1):
+    cache = fname + CACHE_SUFFIX
+    stamp = _cache_stamp(fname, sep)
+    for attempt in range(CACHE_RETRIES):
+        version = os.path.realpath(cache)           # Resolve once, so all arrays come from the same version
+        meta = _cache_valid(version, stamp)
+        if meta is None:
+            [version, meta] = write_csr_cache(fname, sep, workers, force=False)
+        try:
+            arrays = [np.load(os.path.join(version, name+'.npy'), mmap_mode='r') for name in CACHE_ARRAYS]
+        except (IOError, OSError, ValueError):
+            continue                                # Replaced and removed by another process, so try again
+        return arrays + [meta['raw_edges']]
+    raise IOError('cache of ' + fname + ' keeps changing')
+
+#### Out-of-core degree statistics. These stream the edge file in chunks (read_edge_chunks) and never
+#### build the graph, so one can check the size and degree distribution of a huge file before loading it.
+####
+#### Vertex names are collected first, in a sorted array of size n. Exact degrees need duplicate and
+#### reciprocal edges to be removed. This is done in passes over the file: every distinct edge key is
+#### hashed to one pass, and each pass only keeps the distinct keys hashed to it. With m edge lines, a
+#### pass holds about m/passes keys. By default (passes=None), the number of passes is the smallest that
+#### keeps this below max(n, DEDUP_KEYS), so the memory is O(n + DEDUP_KEYS + chunk_bytes) words no matter
+#### how many edges the file has: small files take one pass, and huge ones a few more. If the file is
+#### known to have every undirected edge exactly once, dedup=False skips this and uses a single O(n) pass.
+####
+
+DEDUP_KEYS = 1 << 24        # Edge keys (int64) kept in memory at once by a deduplication pass, besides O(n)
+HASH = np.uint64(0x9E3779B97F4A7C15)     # Multiplier of the (Fibonacci) hash that spreads keys over passes
+
+#### Sorted array of the vertex names in fname (endpoints of the non-self-loop edges)
+####
+
+def stream_vertices(fname, sep=None):
+    return _stream_vertices(fname, sep)[0]
+
+# Sorted vertex names and number of edge lines of fname
+def _stream_vertices(fname, sep):
+    labels = np.zeros(0, dtype=str)
+    pending = []                # Names of recent chunks, merged into labels once they get as big as labels
+    pending_size = 0
+    raw_edges = 0
+    for (u, v, raw) in read_edge_chunks(fname, sep):
+        raw_edges += raw
+        names = np.unique(np.concatenate((u, v)))
+        pending.append(names)
+        pending_size += len(names)
+        if pending_size >= len(labels):
+            labels = np.unique(np.concatenate([labels] + pending))
+            pending = []
+            pending_size = 0
+    if pending:
+        labels = np.unique(np.concatenate([labels] + pending))
+    return [labels, raw_edges]
+
+#### Degrees of all vertices of fname. Output is [labels, degs, raw_edges], where degs[i] is the degree
+#### of the vertex with name labels[i], and raw_edges is the number of edge lines. passes=None picks the
+#### number of deduplication passes from the memory bound above.
+####
+
+def stream_degrees(fname, sep=None, passes=None, dedup=True):
+    [labels, raw_edges] = _stream_vertices(fname, sep)
+    n = len(labels)
+    degs = np.zeros(n, dtype=np.int64)
+    if passes is None:
+        passes = max(1, -(-raw_edges // max(n, DEDUP_KEYS)))     # Ceiling of m / max(n, DEDUP_KEYS)
+    for cur in range(passes if dedup else 1):
+        keys = []
+        for (u, v, raw) in read_edge_chunks(fname, sep):
+            u = np.searchsorted(labels, u)      # Names to IDs
+            v = np.searchsorted(labels, v)
+            if not dedup:
+                degs += np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+                continue
+            chunk_keys = np.minimum(u, v)*n + np.maximum(u, v)
+            if passes > 1:
+                mine = (chunk_keys.astype(np.uint64)*HASH >> np.uint64(32)) % np.uint64(passes) == cur     # Keys of this pass
+                chunk_keys = chunk_keys[mine]
+            keys.append(np.unique(chunk_keys))
+            if len(keys) > 1 and sum(len(k) for k in keys) > 2*len(keys[0]):
+                keys = [np.unique(np.concatenate(keys))]    # Keep the distinct keys of this pass compact
+        if keys:
+            keys = np.unique(np.concatenate(keys))
+            degs += np.bincount(keys // n, minlength=n) + np.bincount(keys % n, minlength=n)
+    return [labels, degs, raw_edges]
+
+#### Size of the graph in fname, without loading it. Same output as graph.Size: [vertices (sum of degrees) wedges]
+####
+
+def stream_size(fname, sep=None, passes=None, dedup=True):
+    [labels, degs, raw_edges] = stream_degrees(fname, sep, passes, dedup)
+    wedge = float(np.sum(degs*(degs-1)))/2
+    return [len(labels), int(np.sum(degs)), wedge]
+
+#### Degree distribution of the graph in fname, without loading it. Same output as graph.Deg_dist,
+#### and the list is written to dd_fname if it is given.
+####
+
+def stream_deg_dist(fname, sep=None, passes=None, dedup=True, dd_fname=''):
+    [labels, degs, raw_edges] = stream_degrees(fname, sep, passes, dedup)
+    dd = np.bincount(degs)
+    if dd_fname != '':
+        with open(dd_fname, 'w') as f_output:
+            for count in dd:
+                f_output.write(str(count)+'\n')
+    return dd
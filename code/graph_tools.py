@@ -1,8 +1,10 @@
 import os
 import re
-import copy
+import itertools
+import bisect
 import numpy as np
 import random
+import graph_io
 
 ##### This is the main graph class. It contains the methods for creating and 
 ##### minor manipulations of graphs. The creation and edge insertion process creates 
@@ -28,6 +30,16 @@ class graph(object):
         self.vertices = set()    # Vertices are stored in a set   
         self.degrees = dict()    # Degrees stored as dictionary
         self.colors = dict()     # Colors assigned to each node in the graph
+        self.labels = None       # Original names of vertices, if they were interned (see Read_edges)
+        self.samplers = dict()   # Cached samplers (see alias_sampler.py), emptied when the graph changes
+
+#### Name of vertex node in the input file. This is just node, unless the graph was read with intern=True.
+####
+
+    def Label(self,node):
+        if self.labels is None:
+            return node
+        return self.labels[node]
 
 #### Checks if (node1, node2) is edge of graph. Output is 1 (yes) or 0 (no).
 ####
@@ -50,6 +62,8 @@ class graph(object):
 
         if node1 == node2:            # Self loop, so do nothing
             return
+        if self.samplers and not (node1 in self.vertices and node2 in self.adj_list[node1]):     # New edge, so cached samplers are out of date
+            self.samplers.clear()
         if node1 in self.vertices:        # Check if node1 is vertex
             nbrs = self.adj_list[node1]   # nbrs is neighbor list of node1
             if node2 not in nbrs:         # Check if node2 already neighbor of node1
@@ -72,6 +86,19 @@ class graph(object):
             self.adj_list[node2] = {node1}  # Initialize node2's list to have node1
             self.degrees[node2] = 1         # Set degree of node2 to be 1
 
+#### Remove undirected edge (node1, node2), if present. The vertices stay in the graph, even if their degree drops to 0.
+####
+
+    def Remove_und_edge(self,node1,node2):
+        if not (node1 in self.vertices and node2 in self.adj_list[node1]):     # Not an edge, so do nothing
+            return
+        if self.samplers:             # Cached samplers are out of date
+            self.samplers.clear()
+        self.adj_list[node1].discard(node2)         # Remove each endpoint from the other's list
+        self.adj_list[node2].discard(node1)
+        self.degrees[node1] = self.degrees[node1]-1     # Decrement degrees
+        self.degrees[node2] = self.degrees[node2]-1
+
 
 #### Read a graph from a file with list of edges. Arguments are fname (file name),
 #### dirname (directory name), sep (separator). Looks for file dirname/fname.
@@ -80,11 +107,37 @@ class graph(object):
 #### node1 sep node2 sep <anything else>
 #### 
 #### If sep is not set, then it is just whitespace.
+####
+#### With bulk=True, the file is parsed in large chunks into arrays by graph_io, and the graph is built in
+#### one shot. The result is the same, but loading is much faster on big files.
+#### With cache=True, the parsed arrays are also saved in a binary cache next to the file (see graph_io),
+#### and later reads load the cache instead of parsing. This implies bulk=True.
+#### With intern=True, vertices are the integers 0,1,...,n-1 instead of the strings in the file, and
+#### self.labels[v] is the name of vertex v (see Label). Integer keys are smaller and faster to hash
+#### in every dict and set of the algorithms. This also implies bulk=True. Reading more edges into an interned
+#### graph also needs intern=True: names seen before keep their IDs, and new names get the next ones.
+#### With workers > 1 (or None, for all cores), the file is split into chunks that are parsed by a pool
+#### of processes. This also implies bulk=True.
+####
+#### Files ending in .gz, .bz2 or .xz are decompressed on the fly.
 ####
  
-    def Read_edges(self,fname,sep=None):
+    def Read_edges(self,fname,sep=None,bulk=False,cache=False,intern=False,workers=1):
+        if self.labels is not None and not intern:
+            raise ValueError('the vertices of this graph are interned, so read more edges with intern=True')
+        if bulk or cache or intern or workers != 1:
+            if cache:
+                [indptr, indices, labels, num_edges] = graph_io.read_cached_csr(fname, sep, workers)
+            else:
+                [indptr, indices, labels, num_edges] = graph_io.read_csr_arrays(fname, sep, workers)
+            if intern:
+                _fill_graph(self, indptr, indices, self._Intern(labels))
+            else:
+                _fill_graph(self, indptr, indices, labels.tolist())
+            print('raw edges =', num_edges)
+            return
         num_edges = 0
-        with open(fname, 'r') as f_input: # Open file
+        with graph_io.open_edge_file(fname) as f_input: # Open file
             for line in f_input: # Read line by line. This is more memory efficient, but might be slower
                 line = line.strip() # Remove whitespace from edge
                 if not line.startswith('#'): # Skip comments
@@ -95,6 +148,24 @@ class graph(object):
         print('raw edges =', num_edges)    # Print number of lines in file
 
 
+# IDs of the names in labels (an array), for a read with intern=True. The first read sets self.labels. Later reads
+# keep the IDs of names seen before, and give new names the next IDs, so the IDs of the graph stay valid.
+    def _Intern(self,labels):
+        if self.labels is None:
+            if self.vertices:
+                raise ValueError('intern=True needs an empty graph, or one that was read with intern=True')
+            self.labels = labels               # Reverse lookup from IDs to names (a NumPy array)
+            return list(range(len(labels)))
+        index = dict(zip(list(self.labels), itertools.count()))
+        new = [name for name in labels.tolist() if name not in index]
+        index.update(zip(new, itertools.count(len(self.labels))))
+        if isinstance(self.labels, np.ndarray):
+            self.labels = np.concatenate((self.labels, np.array(new, dtype=self.labels.dtype.kind)))
+        else:
+            self.labels = list(self.labels) + new
+        return [index[name] for name in labels.tolist()]
+
+
 #### Give the size of the graph. Outputs [vertices (sum of degrees) wedges]
 #### Note that sum of degrees is twice the number of edges in the undirected case 
 ####
@@ -140,264 +211,105 @@ class graph(object):
             f_input.close()
         return dd 
 
+#### Convert the graph into the array-backed csr_graph (see end of file). Vertices are relabeled 0,1,...,n-1
+#### in the order of adj_list, and the original names are stored in the labels list of the output, so
+#### labels[i] is the name of vertex i. Each neighbor list is sorted.
+####
+
+    def To_csr(self):
+        [nodes, indptr, indices] = self._Csr_arrays()
+        labels = [self.Label(node) for node in nodes]     # labels[i] is the original name of vertex i
+        return csr_graph(indptr, indices, labels)
+
+#### CSR arrays of the graph, where vertex i is nodes[i]. Output is [nodes, indptr, indices]. With sort=False, the
+#### neighbor lists are left in the order of the sets (the orderings below do not need them sorted).
+####
+
+    def _Csr_arrays(self,sort=True):
+        nodes = list(self.adj_list.keys())        # nodes[i] becomes vertex i
+        n = len(nodes)
+        index = dict(zip(nodes, range(n)))        # Inverse map from nodes to 0,...,n-1
+        rows = list(map(self.adj_list.__getitem__, nodes))
+        indptr = np.zeros(n+1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, rows), dtype=np.int64, count=n), out=indptr[1:])
+        nbrs = itertools.chain.from_iterable(rows)        # All neighbor lists, concatenated
+        indices = np.fromiter(map(index.__getitem__, nbrs), dtype=graph_io.index_dtype(n), count=indptr[-1])
+        if sort:
+            base = np.repeat(np.arange(n, dtype=np.int64)*n, np.diff(indptr))     # Sorting keys row*n+nbr sorts each row
+            indices = (np.sort(base + indices) - base).astype(indices.dtype)
+        return [nodes, indptr, indices]
+
     def DegreeOrder(self):
       '''Creates a DAG by imposing an order of vertices based on their degree.'''
-      debug = False
-      core_G = DAG()
-      core_G.top_order = sorted(self.degrees, key=lambda el: self.degrees[el])
-      if debug:
-        print core_G.top_order
-      for source in core_G.top_order:
-        if debug:
-          print "%s: " % source,
-        core_G.vertices.add(source)
-        core_G.adj_list[source] = set()
-        core_G.degrees[source] = 0
-        for node in self.adj_list[source]:
-          if debug:
-            print "%s" % node,
-          if node in core_G.vertices:  # Average case O(1), worse case O(n) 
-            # We already accounted for this edge
-            # (node has higher order than source, so don't add add from higher to lower)
-            if debug:
-              print "(skipping), ",
-            continue
-          else:
-            if debug:
-              print ", ",
-          core_G.adj_list[source].add(copy.deepcopy(node))
-          core_G.degrees[source] += 1
-        if debug:
-          print
-      return core_G
+      [nodes, indptr, indices] = self._Csr_arrays(sort=False)
+      return self._Orient_ids(nodes, indptr, indices, np.argsort(np.diff(indptr), kind='stable'))
 
     def RandomOrder(self):
       '''Creates a DAG by imposing a random order to the vertices of the graph.'''
-      debug = False
-      core_G = DAG()
-      # Makes a copy of the set of vertices and turns them into a list
-      core_G.top_order = list(self.vertices)
-      random.shuffle(core_G.top_order)
-      for source in core_G.top_order:
-        if debug:
-          print "%s: " % source,
-        core_G.vertices.add(source)
-        core_G.adj_list[source] = set()
-        core_G.degrees[source] = 0
-        for node in self.adj_list[source]:
-          if debug:
-            print "%s" % node,
-          if node in core_G.vertices:  # Average case O(1), worse case O(n) 
-            # We already accounted for this edge
-            # (node has higher order than source, so don't add add from higher to lower)
-            if debug:
-              print "(skipping), ",
-            continue
-          else:
-            if debug:
-              print ", ",
-          core_G.adj_list[source].add(copy.deepcopy(node))
-          core_G.degrees[source] += 1
-        if debug:
-          print
-      return core_G
+      [nodes, indptr, indices] = self._Csr_arrays(sort=False)
+      ordering = list(range(len(nodes)))
+      random.shuffle(ordering)
+      return self._Orient_ids(nodes, indptr, indices, np.array(ordering, dtype=np.int64))
 
 
 #### The fun stuff. This computes the core numbers/degeneracy by applying the minimum vertex removal algorithm. Basically, it iteratively removes 
-#### the vertex of minimum degree, till the graph is empty. This leads to an order of vertex removal, say v1, v2, v3,...,vn. The algorithm then
-#### constructs the graph where all edges only point from vi to vj where i < j. This creates a DAG, where each edge of the original graph is directed.
-#### 
-#### The output is this directed graph. Each DAG object (see end) has an associated topological ordering of vertices. In this case, this ordering
-#### is just v1, v2, ..., vn.
-#### 
+#### the vertex of minimum degree, till the graph is empty. This leads to an order of vertex removal, say v1, v2, v3,...,vn. The core number
+#### of vi is its degree at the time it is removed (or the core number of v(i-1), if that is larger), and the degeneracy is the largest
+#### core number. The actual work is done on flat arrays by core_decomposition (see end of file).
+####
+#### Output is [ordering, core, degeneracy], where ordering is the list v1, v2, ..., vn, and core is a dictionary of core numbers.
+####
 
-    def Degeneracy(self):
-        G = copy.deepcopy(self)      # Generate deepcopy, since we will modify G
-        n = len(G.vertices)
-        top_order = [0]*(n+1)        # Initialize list of degeneracy ordering
-        core_G = DAG()               # This is the DAG that will be output
-        core_G.vertices = copy.deepcopy(G.vertices)    # Vertices are the same
-        for node in core_G.vertices: # Initialize adjacency list and degrees of core_G, the output
-            core_G.adj_list[node] = set()
-            core_G.degrees[node] = 0
-
-        deg_list = [set() for _ in range(n)]    # Initialize list, where ith entry is set of deg i vertices
-        min_deg = n       # variable for min degree of graph
-
-       
-        for node in G.vertices:    # Loop over nodes
-            deg = G.degrees[node]      # Get degree of node
-            deg_list[deg].add(node)    # Update deg_list with node
-            if deg < min_deg:          # Update min_deg
-                min_deg = deg
-
-        # At this stage, deg_list[d] is the list of vertices of degree d
-
-        for i in range(n):        # The main loop, just going n times
-                                  
-            # We first need the vertex of minimum degree. Due to the looping and deletion of vertex, we may have exhaused
-            # all vertices of minimum degree. We need to update the minimum degree
-
-            while len(deg_list[min_deg]) == 0:  # update min_deg to reach non-empty set
-                min_deg = min_deg+1
-                
-            source = deg_list[min_deg].pop()    # get vertex called "source" with minimum degree 
-            core_G.top_order.append(source)     # append to this to topological ordering
-            
-            # We got the vertex of the ordering! All we need to do now is delete vertex from the graph,
-            # and update deg_list appropriately.
+    def Core_decomposition(self):
+        [nodes, indptr, indices] = self._Csr_arrays(sort=False)
+        [order, core, degeneracy] = core_decomposition(indptr, indices)
+        ordering = [nodes[i] for i in order.tolist()]
+        core = dict(zip(nodes, core.tolist()))
+        return [ordering, core, degeneracy]
 
-            for node in G.adj_list[source]: # loop over nbrs of source, each nbr called "node" 
- 
-                # We update deg_list
-                deg = G.degrees[node]           # degree of node
-                deg_list[deg].remove(node)      # move node in deg_list, decreasing its degree by 1
-                deg_list[deg-1].add(node)
-                if deg-1 < min_deg:             # update min_deg in case node has lower degree
-                    min_deg = deg-1
-
-               
-                # We then remove the edge (node,source) from G
-                G.adj_list[node].remove(source) # remove this edge from G
-                G.degrees[node] -= 1            # update degree of node
-
-                core_G.adj_list[source].add(node) # Add directed edge (source,node) to output DAG core_G
-                core_G.degrees[source] += 1       # Update the degree of source
-                
-        return core_G
+#### This constructs the graph where all edges only point from vi to vj where i < j, for the degeneracy ordering
+#### v1, v2, ..., vn. This creates a DAG, where each edge of the original graph is directed.
+####
+#### The output is this directed graph. Each DAG object (see end) has an associated topological ordering of vertices. In this case, this ordering
+#### is just v1, v2, ..., vn. DegenOrder is the same method.
+####
 
+    def Degeneracy(self):
+        return self.DegenOrder()
 
     def DegenOrder(self):
-        n = len(self.vertices)
-        touched = {}                 # Map of touched vertices
-        cur_degs = {}                # Maintains degrees as vertices are processed
-        core_G = DAG()               # This is the DAG that will be output
-        core_G.vertices = set(self.vertices)    # Vertices are the same
-        for node in core_G.vertices: # Initialize adjacency list and degrees of core_G, the output
-            core_G.adj_list[node] = set()
-            core_G.degrees[node] = 0
-
-        deg_list = [set() for _ in range(n)]    # Initialize list, where ith entry is set of deg i vertices
-        min_deg = n       # variable for min degree of graph
-
-       
-        for node in self.vertices:    # Loop over nodes
-            deg = self.degrees[node]      # Get degree of node
-            touched[node] = 0          # Node not yet touched
-            cur_degs[node] = deg       # cur_degs of node just degree
-            deg_list[deg].add(node)    # Update deg_list with node
-            if deg < min_deg:          # Update min_deg
-                min_deg = deg
-
-        # At this stage, deg_list[d] is the list of vertices of degree d
+        [nodes, indptr, indices] = self._Csr_arrays(sort=False)
+        return self._Orient_ids(nodes, indptr, indices, core_decomposition(indptr, indices)[0])
 
-        for i in range(n):        # The main loop, just going n times
-                                  
-            # We first need the vertex of minimum degree. Due to the looping and deletion of vertex, we may have exhaused
-            # all vertices of minimum degree. We need to update the minimum degree
-
-            while len(deg_list[min_deg]) == 0:  # update min_deg to reach non-empty set
-                min_deg = min_deg+1
-                
-            source = deg_list[min_deg].pop()    # get vertex called "source" with minimum degree 
-            core_G.top_order.append(source)     # append to this to topological ordering
-            touched[source] = 1                 # source has been touched
-            
-            # We got the vertex of the ordering! All we need to do now is "delete" vertex from the graph,
-            # and update deg_list appropriately.
-
-            for node in self.adj_list[source]: # loop over nbrs of source, each nbr called "node"
-                
-                if touched[node] == 1:         # if node has been touched, do nothing
-                    continue 
- 
-                # We update deg_list
-                deg = cur_degs[node]           # degree of node
-                deg_list[deg].remove(node)      # move node in deg_list, decreasing its degree by 1
-                deg_list[deg-1].add(node)
-                if deg-1 < min_deg:             # update min_deg in case node has lower degree
-                    min_deg = deg-1
-                cur_degs[node] = deg-1          # decrement cur_deg because it has another touched neighbor
-
-                core_G.adj_list[source].add(node) # Add directed edge (source,node) to output DAG core_G
-                core_G.degrees[source] += 1       # Update the degree of source
-                
-        return core_G
+#### Just the degeneracy ordering v1, v2, ..., vn, as a list
+####
 
     def DegenOrdering(self):
-        n = len(self.vertices)
-        touched = {}                 # Map of touched vertices
-        cur_degs = {}                # Maintains degrees as vertices are processed
-        top_order = []               # Topological ordering
-
-        deg_list = [set() for _ in range(n)]    # Initialize list, where ith entry is set of deg i vertices
-        min_deg = n       # variable for min degree of graph
-
-       
-        for node in self.vertices:    # Loop over nodes
-            deg = self.degrees[node]      # Get degree of node
-            touched[node] = 0          # Node not yet touched
-            cur_degs[node] = deg       # cur_degs of node just degree
-            deg_list[deg].add(node)    # Update deg_list with node
-            if deg < min_deg:          # Update min_deg
-                min_deg = deg
-
-        # At this stage, deg_list[d] is the list of vertices of degree d
-
-        for i in range(n):        # The main loop, just going n times
-                                  
-            # We first need the vertex of minimum degree. Due to the looping and deletion of vertex, we may have exhaused
-            # all vertices of minimum degree. We need to update the minimum degree
-
-            while len(deg_list[min_deg]) == 0:  # update min_deg to reach non-empty set
-                min_deg = min_deg+1
-                
-            source = deg_list[min_deg].pop()    # get vertex called "source" with minimum degree 
-            top_order.append(source)     # append to this to topological ordering
-            touched[source] = 1                 # source has been touched
-            
-            # We got the vertex of the ordering! All we need to do now is "delete" vertex from the graph,
-            # and update deg_list appropriately.
-
-            for node in self.adj_list[source]: # loop over nbrs of source, each nbr called "node"
-                
-                if touched[node] == 1:         # if node has been touched, do nothing
-                    continue 
- 
-                # We update deg_list
-                deg = cur_degs[node]           # degree of node
-                deg_list[deg].remove(node)      # move node in deg_list, decreasing its degree by 1
-                deg_list[deg-1].add(node)
-                if deg-1 < min_deg:             # update min_deg in case node has lower degree
-                    min_deg = deg-1
-                cur_degs[node] = deg-1          # decrement cur_deg because it has another touched neighbor
-
-                
-        return top_order
+        return self.Core_decomposition()[0]
 
 #### This function creates a DAG by orienting the edges according to "ordering", which is a permutation
-#### of the vertices. 
-
-    def Orient(self,ordering):
+#### of the vertices. The edges are oriented on flat arrays by orient_csr (see end of file), and the sets of
+#### the DAG are filled from its output. The DAG has in-lists (in_list, indegrees) unless in_lists=False.
+
+    def Orient(self,ordering,in_lists=True):
+        [nodes, indptr, indices] = self._Csr_arrays(sort=False)
+        index = dict(zip(nodes, range(len(nodes))))
+        order = np.fromiter(map(index.__getitem__, ordering), dtype=np.int64, count=len(nodes))
+        return self._Orient_ids(nodes, indptr, indices, order, in_lists)
+
+# Orient the CSR arrays of _Csr_arrays by the ordering order (an array of vertex IDs), into a DAG with the names in nodes
+    def _Orient_ids(self,nodes,indptr,indices,order,in_lists=False):
+        rank = np.empty(len(nodes), dtype=np.int64)
+        rank[order] = np.arange(len(nodes))
+        [out_ptr, out_idx, in_ptr, in_idx] = orient_csr(indptr, indices, rank, in_lists)
         output = DAG()          # Creating empty output graph
-        counter = 1
-        for node in ordering:   # Loop over nodes
-            output.vertices.add(node)   # First add node to vertices in output
-            output.top_order_inv[node] = counter    # Setting inverse of topological ordering
-            counter += 1
-            output.adj_list[node] = set()  # Set up empty adjacency and in lists
-            output.in_list[node] = set()
-            output.degrees[node] = 0
-            output.indegrees[node] = 0
-            for nbr in self.adj_list[node]: # For every neighbor nbr of node
-                if nbr in output.vertices: # Determine which is higher in order. If nbr already in output.vertices, then nbr is lower. 
-                    output.in_list[node].add(nbr)  # If nbr is lower, then nbr is in-neighbor.
-                    output.indegrees[node] += 1       # Update degree of nbr accordingly. 
-                else:
-                    output.adj_list[node].add(nbr) # If nbr is higher, nbr is out neighbor.
-                    output.degrees[node] += 1         # Update degree of nbr accordingly.          
-        
-        output.top_order = ordering         # Topological ordering is as given by input
+        output.labels = self.labels     # Same vertex names as the graph
+        _fill_graph(output, out_ptr, out_idx, nodes)
+        if in_lists:
+            output.in_list.update(zip(nodes, _csr_sets(in_ptr, in_idx, nodes)))
+            output.indegrees.update(zip(nodes, np.diff(in_ptr).tolist()))
+        output.top_order = [nodes[i] for i in order.tolist()]     # Topological ordering is as given by input
+        output.top_order_inv.update(zip(output.top_order, range(1, len(nodes)+1)))     # Positions start at 1
         return output 
                 
 
@@ -410,10 +322,10 @@ class DAG(graph):
 
     def __init__(self):
         super(DAG,self).__init__()
-        DAG.top_order = []
-        DAG.top_order_inv = dict()
-        DAG.in_list = dict()            # Optional in-neighbor list. adj_list only maintains out neighbors
-        DAG.indegrees = dict()          # Optional indegrees
+        self.top_order = []
+        self.top_order_inv = dict()
+        self.in_list = dict()            # Optional in-neighbor list. adj_list only maintains out neighbors
+        self.indegrees = dict()          # Optional indegrees
 
     def Output(self,fname):
         f_output = open(fname,'w')
@@ -424,3 +336,448 @@ class DAG(graph):
                 f_output.write(str(node2)+' ')
             f_output.write('\n')
 
+
+#### Convert to csr_DAG. Vertices are relabeled by their position in the topological ordering (if the DAG
+#### has a complete one), so out-lists sorted by ID are also sorted by position in the ordering.
+####
+
+    def To_csr(self):
+        if len(self.top_order) == len(self.vertices):
+            nodes = list(self.top_order)            # Vertex i is the ith vertex in the ordering
+        else:
+            nodes = list(self.adj_list.keys())
+        index = dict((node, i) for i, node in enumerate(nodes))
+        rows = [sorted(index[nbr] for nbr in self.adj_list[node]) for node in nodes]
+        labels = [self.Label(node) for node in nodes]
+        return csr_DAG(*_rows_to_csr(rows), top_order=np.arange(len(nodes)), labels=labels)
+
+
+
+##### The csr_graph class is a compact, array-backed alternative to the graph class above. Vertices are the
+##### integers 0,1,...,n-1, and the adjacency list is stored in compressed sparse row (CSR) form as two
+##### NumPy arrays: the neighbors of vertex v are indices[indptr[v]:indptr[v+1]], sorted in increasing order.
+##### Each undirected edge appears in the lists of both endpoints, so indptr[n] is the sum of degrees.
+##### The original vertex names (say, the strings in the edge file) are kept in labels, where labels[v]
+##### is the name of v.
+#####
+##### For the large SNAP graphs, this is far smaller than the dict of sets, and there is no pointer chasing.
+##### The class has the same Size, Deg_dist, isEdge methods as graph. It also exposes vertices, adj_list and
+##### degrees as read-only views, so code written against graph (like wedge_enum or four_vertex_count)
+##### runs unchanged on either type. Use graph.To_csr() and csr_graph.To_graph() to convert.
+
+class csr_graph(object):
+
+#### Initializing from CSR arrays. With no arguments, the graph is empty.
+####
+
+    def __init__(self,indptr=None,indices=None,labels=None):
+        if indptr is None:
+            indptr = np.zeros(1, dtype=np.int64)
+        if indices is None:
+            indices = np.zeros(0, dtype=graph_io.index_dtype(len(indptr)-1))
+        self.indptr = indptr        # Row pointers, length n+1
+        self.indices = indices      # Concatenated sorted neighbor lists
+        self.labels = labels        # Original vertex names, or None if the names are just 0,...,n-1
+        self.n = len(indptr)-1      # Number of vertices
+        self.deg = np.diff(indptr)  # Degree array
+        self.edge_keys = None       # Sorted keys of the edges, built by Has_edges when first needed
+        self.samplers = dict()      # Cached samplers (see alias_sampler.py)
+        self.rows = _csr_rows(indptr, indices)      # The views behind adj_list and degrees, made once
+        self.deg_map = _array_map(self.deg)
+
+    @property
+    def vertices(self):
+        return range(self.n)
+
+    @property
+    def adj_list(self):
+        return self.rows
+
+    @property
+    def degrees(self):
+        return self.deg_map
+
+#### Name of vertex v in the original input
+####
+
+    def Label(self,v):
+        if self.labels is None:
+            return v
+        return self.labels[v]
+
+#### Checks if (node1, node2) is edge of graph by binary search in the sorted neighbor lists. Output is 1 (yes) or 0 (no).
+#### This is a scalar bisect within the row, with no slicing, so it is cheap enough to call once per wedge. (wedge_enum
+#### and triangle_info do not call it on a csr_graph, and use the array kernels of triangle_counters.py instead.)
+####
+
+    def isEdge(self,node1,node2):
+        indptr = self.indptr
+        indices = self.indices
+        for (u, v) in ((node1, node2), (node2, node1)):
+            if 0 <= u < self.n:
+                end = int(indptr[u+1])
+                pos = bisect.bisect_left(indices, v, int(indptr[u]), end)
+                if pos < end and indices[pos] == v:
+                    return 1                     # Edge is present!
+        return 0                # Edge not present!
+
+#### Vectorized isEdge: for arrays nodes1 and nodes2, output is the boolean array of whether each (nodes1[i], nodes2[i])
+#### is an edge. Edge (u,v) has key u*n+v, and the keys are sorted (rows are sorted), so this is one binary search each.
+####
+
+    def Has_edges(self,nodes1,nodes2):
+        return self._Find_keys(np.asarray(nodes1, dtype=np.int64)*self.n + np.asarray(nodes2))
+
+    def _Edge_keys(self):
+        if self.edge_keys is None:
+            self.edge_keys = np.repeat(np.arange(self.n, dtype=np.int64), self.deg)*self.n + self.indices
+        return self.edge_keys
+
+    def _Find_keys(self,wanted):
+        keys = self._Edge_keys()
+        if len(keys) == 0:
+            return np.zeros(np.shape(wanted), dtype=bool)
+        pos = np.searchsorted(keys, wanted)
+        pos[pos == len(keys)] = 0
+        return keys[pos] == wanted
+
+#### Give the size of the graph. Outputs [vertices (sum of degrees) wedges], just like graph.Size
+####
+
+    def Size(self):
+        wedge = float(np.sum(self.deg*(self.deg-1)))/2    # Sum of {d_v \choose 2} over all vertices
+        return [self.n, int(self.indptr[-1]), wedge]
+
+#### Print the adjacency list of the graph (with original vertex names). Output is written in dirname/fname.
+####
+
+    def Output(self,fname,dirname):
+        os.chdir(dirname)
+        names = _label_list(self)
+        with open(fname,'w') as f_output:
+            for node1 in range(self.n):
+                f_output.write(str(names[node1])+': ')
+                for node2 in self.indices[self.indptr[node1]:self.indptr[node1+1]]:
+                    f_output.write(str(names[node2])+' ')
+                f_output.write('\n')
+            f_output.write('------------------\n')
+
+#### Compute the degree distribution of graph. Same output as graph.Deg_dist.
+####
+
+    def Deg_dist(self,fname=''):
+        dd = np.bincount(self.deg)                # dd[i] is number of vertices of degree i
+        if fname != '':
+            with open(fname,'w') as f_input:
+                for count in dd:
+                    f_input.write(str(count)+'\n')
+        return dd 
+
+#### Convert back into a graph, where vertices get their original names.
+####
+
+    def To_graph(self):
+        output = graph()
+        _fill_graph(output, self.indptr, self.indices, _label_list(self))
+        return output
+
+#### Read a graph from a file with list of edges, in the same format as graph.Read_edges.
+#### The file is parsed by graph_io into CSR arrays directly. With cache=True, the arrays are
+#### memory-mapped from the binary cache of the file (built on first use). With workers > 1 (or None,
+#### for all cores), the file is parsed by a pool of processes.
+####
+
+    def Read_edges(self,fname,sep=None,cache=False,workers=1):
+        if cache:
+            [indptr, indices, labels, num_edges] = graph_io.read_cached_csr(fname, sep, workers)
+        else:
+            [indptr, indices, labels, num_edges] = graph_io.read_csr_arrays(fname, sep, workers)
+        self.__init__(indptr, indices, labels)
+        print('raw edges =', num_edges)
+
+#### Core numbers and degeneracy ordering, as in graph.Core_decomposition. Output is [ordering, core, degeneracy],
+#### where ordering and core are arrays.
+####
+
+    def Core_decomposition(self):
+        return core_decomposition(self.indptr, self.indices)
+
+    def DegenOrdering(self):
+        return core_decomposition(self.indptr, self.indices)[0]
+
+#### The degeneracy DAG, as a csr_DAG
+####
+
+    def DegenOrder(self):
+        return self.Orient(self.DegenOrdering())
+
+    def Degeneracy(self):
+        return self.Orient(self.DegenOrdering())
+
+#### Creates a csr_DAG by orienting the edges according to "ordering", which is a permutation of 0,...,n-1.
+#### Each out-list (and in-list) is sorted by position in the ordering. See orient_csr.
+####
+
+    def Orient(self,ordering):
+        top_order = np.asarray(ordering, dtype=np.int64)
+        rank = np.empty(self.n, dtype=np.int64)
+        rank[top_order] = np.arange(self.n)      # rank[v] is the position of v in ordering
+        [out_ptr, out_idx, in_ptr, in_idx] = orient_csr(self.indptr, self.indices, rank)
+        return csr_DAG(out_ptr, out_idx, top_order, self.labels, in_ptr, in_idx)
+
+#### DAGs for ordering by degree (ties by ID) and for a random ordering, as in graph
+####
+
+    def DegreeOrder(self):
+        return self.Orient(np.argsort(self.deg, kind='stable'))
+
+    def RandomOrder(self):
+        return self.Orient(np.random.permutation(self.n))
+
+
+#### The csr_DAG is the array-backed version of DAG. indptr/indices hold the out-lists, each sorted by
+#### position in the topological ordering. top_order is an array of vertices and top_order_inv[v] is the
+#### position of v in it. The in-lists are stored the same way in in_indptr/in_indices.
+
+class csr_DAG(csr_graph):
+
+    def __init__(self,indptr=None,indices=None,top_order=None,labels=None,in_indptr=None,in_indices=None):
+        super(csr_DAG,self).__init__(indptr,indices,labels)
+        if top_order is None:
+            top_order = np.arange(self.n)
+        self.top_order = top_order
+        self.top_order_inv = np.empty(self.n, dtype=np.int64)
+        self.top_order_inv[top_order] = np.arange(self.n)
+        if in_indptr is None:
+            # In-lists are the transpose of the out-lists. Sorting edges by (target, position of source)
+            # gives in-lists in topological order.
+            sources = np.repeat(np.arange(self.n), self.deg)
+            perm = np.lexsort((self.top_order_inv[sources], self.indices))
+            in_indices = sources[perm].astype(self.indices.dtype)
+            in_indptr = np.zeros(self.n+1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=self.n), out=in_indptr[1:])
+        self.in_indptr = in_indptr
+        self.in_indices = in_indices
+        self.indeg = np.diff(self.in_indptr)
+        self.in_rows = _csr_rows(self.in_indptr, self.in_indices)
+        self.indeg_map = _array_map(self.indeg)
+
+    @property
+    def in_list(self):
+        return self.in_rows
+
+    @property
+    def indegrees(self):
+        return self.indeg_map
+
+#### Out-lists are sorted by topological position rather than by ID, so we scan instead of binary search.
+####
+
+    def isEdge(self,node1,node2):
+        for (u, v) in ((node1, node2), (node2, node1)):
+            if 0 <= u < self.n and v in self.indices[self.indptr[u]:self.indptr[u+1]]:
+                return 1
+        return 0
+
+#### Out-lists are sorted by topological position, so the key of edge (u,v) is u*n plus the position of v.
+#### An edge of the DAG can go either way.
+
+    def Has_edges(self,nodes1,nodes2):
+        nodes1 = np.asarray(nodes1, dtype=np.int64)
+        nodes2 = np.asarray(nodes2, dtype=np.int64)
+        rank = self.top_order_inv
+        return self._Find_keys(nodes1*self.n + rank[nodes2]) | self._Find_keys(nodes2*self.n + rank[nodes1])
+
+    def _Edge_keys(self):
+        if self.edge_keys is None:
+            sources = np.repeat(np.arange(self.n, dtype=np.int64), self.deg)
+            self.edge_keys = sources*self.n + self.top_order_inv[self.indices]
+        return self.edge_keys
+
+    def To_graph(self):
+        output = DAG()
+        names = _label_list(self)
+        _fill_graph(output, self.indptr, self.indices, names)
+        output.in_list.update(zip(names, _csr_sets(self.in_indptr, self.in_indices, names)))
+        output.indegrees.update(zip(names, self.indeg.tolist()))
+        output.top_order = [names[node] for node in self.top_order]
+        for (pos, name) in enumerate(output.top_order):
+            output.top_order_inv[name] = pos+1          # Same 1-based positions as graph.Orient
+        return output
+
+    def Output(self,fname):
+        names = _label_list(self)
+        with open(fname,'w') as f_output:
+            for node1 in self.top_order:
+                f_output.write(str(names[node1])+': ')
+                for node2 in self.indices[self.indptr[node1]:self.indptr[node1+1]]:
+                    f_output.write(str(names[node2])+' ')
+                f_output.write('\n')
+
+
+#### Helpers for the CSR classes
+####
+
+#### Core decomposition by the bucket-queue algorithm of Batagelj and Zaversnik. The input is the CSR arrays of an
+#### undirected graph. Vertices are kept in the array vert, sorted by current degree, and bin_start[d] is the position in
+#### vert of the first vertex of current degree d. pos[v] is the position of v in vert. Removing a vertex decrements
+#### the degree of its unremoved neighbors; each such neighbor is swapped with the first vertex of its bin, and that bin
+#### shrinks by one. So every step is O(1) and the whole algorithm is linear time.
+####
+#### Output is [ordering, core, degeneracy]: the removal order (array), the core number of each vertex (array), and
+#### the degeneracy (max core number).
+####
+
+def core_decomposition(indptr, indices):
+    n = len(indptr)-1
+    if n == 0:
+        return [np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0]
+    degs = np.diff(indptr)
+    vert_array = np.argsort(degs, kind='stable')          # Vertices sorted by degree (the bucket sort)
+    pos_array = np.empty(n, dtype=np.int64)
+    pos_array[vert_array] = np.arange(n)
+    bin_array = np.zeros(degs.max()+2, dtype=np.int64)
+    np.cumsum(np.bincount(degs), out=bin_array[1:])      # bin_start[d] = number of vertices with degree < d
+
+    # The main loop does scalar work, which is much faster on lists than on NumPy arrays
+    deg = degs.tolist()
+    vert = vert_array.tolist()
+    pos = pos_array.tolist()
+    bin_start = bin_array.tolist()
+    ptr = indptr.tolist()
+    adj = indices.tolist()
+
+    for i in range(n):
+        v = vert[i]                     # Vertex of minimum current degree
+        dv = deg[v]
+        for j in range(ptr[v], ptr[v+1]):
+            u = adj[j]
+            du = deg[u]
+            if du > dv:                 # u not yet removed (removed vertices have degree <= dv)
+                pu = pos[u]
+                pw = bin_start[du]      # First vertex w of u's bin: swap u and w, then shrink the bin
+                w = vert[pw]
+                if u != w:
+                    pos[u] = pw
+                    vert[pu] = w
+                    pos[w] = pu
+                    vert[pw] = u
+                bin_start[du] += 1
+                deg[u] = du-1
+
+    core = np.array(deg, dtype=np.int64)      # The degree at removal time is the core number
+    return [np.array(vert, dtype=np.int64), core, int(core.max())]
+
+# Pack a list of neighbor lists into (indptr, indices)
+def _rows_to_csr(rows):
+    indptr = np.zeros(len(rows)+1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.fromiter(itertools.chain.from_iterable(rows), dtype=graph_io.index_dtype(len(rows)), count=indptr[-1])
+    return [indptr, indices]
+
+#### Orient the undirected graph with CSR arrays indptr/indices, where rank[v] is the position of v in the ordering.
+#### Every edge points from the endpoint of lower rank to the one of higher rank. All the work is done by sorting
+#### edge arrays, so there is no per-edge Python work. Output is [out_indptr, out_indices, in_indptr, in_indices],
+#### and every out-list and in-list is sorted by rank. With in_lists=False, the in-lists are skipped (and are None).
+####
+
+def orient_csr(indptr, indices, rank, in_lists=True):
+    n = len(indptr)-1
+    src = np.repeat(np.arange(n), np.diff(indptr))
+    dst = np.asarray(indices, dtype=np.int64)
+    up = rank[src] < rank[dst]              # Keep each edge once, pointing up the ordering
+    src = src[up]
+    dst = dst[up]
+    out_perm = np.argsort(src*n + rank[dst], kind='stable')     # Sort by (source, rank of target)
+    dtype = graph_io.index_dtype(n)
+    out_indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=out_indptr[1:])
+    if not in_lists:
+        return [out_indptr, dst[out_perm].astype(dtype), None, None]
+    in_perm = np.argsort(dst*n + rank[src], kind='stable')      # Sort by (target, rank of source)
+    in_indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(dst, minlength=n), out=in_indptr[1:])
+    return [out_indptr, dst[out_perm].astype(dtype), in_indptr, src[in_perm].astype(dtype)]
+
+# Neighbor sets from CSR arrays, where names[i] is the name of vertex i
+def _csr_sets(indptr,indices,names):
+    table = np.empty(len(names), dtype=object)
+    table[:] = names
+    nbr_names = table[indices].tolist()     # Neighbor lists, all concatenated
+    bounds = indptr.tolist()
+    return [set(nbr_names[bounds[node]:bounds[node+1]]) for node in range(len(names))]
+
+# Set up the vertices, adjacency lists and degrees of graph G from CSR arrays. If G already has edges, the new
+# neighbor sets are merged into the old ones, just like inserting the edges one at a time.
+def _fill_graph(G,indptr,indices,names):
+    G.samplers.clear()
+    if G.adj_list:
+        adj_list = G.adj_list
+        for (name, nbrs) in zip(names, _csr_sets(indptr, indices, names)):
+            if name in adj_list:
+                adj_list[name] |= nbrs
+            else:
+                adj_list[name] = nbrs
+            G.degrees[name] = len(adj_list[name])
+        G.vertices.update(names)
+        return
+    G.vertices.update(names)
+    G.adj_list.update(zip(names, _csr_sets(indptr, indices, names)))
+    G.degrees.update(zip(names, np.diff(indptr).tolist()))
+
+# Vertex names of a csr_graph as a plain list
+def _label_list(G):
+    if G.labels is None:
+        return list(range(G.n))
+    if isinstance(G.labels, np.ndarray):
+        return G.labels.tolist()
+    return list(G.labels)
+
+# Read-only view of CSR arrays as an adjacency list: rows[v] is the neighbor array of v
+class _csr_rows(object):
+
+    def __init__(self,indptr,indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    def __getitem__(self,v):
+        return self.indices[self.indptr[v]:self.indptr[v+1]]
+
+    def __len__(self):
+        return len(self.indptr)-1
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __contains__(self,v):
+        return 0 <= v < len(self)
+
+    def keys(self):
+        return range(len(self))
+
+# Read-only view of an array indexed by vertex, with the dict methods used on graph.degrees
+class _array_map(object):
+
+    def __init__(self,values):
+        self.array = values
+
+    def __getitem__(self,v):
+        return self.array[v]
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return iter(range(len(self.array)))
+
+    def __contains__(self,v):
+        return 0 <= v < len(self.array)
+
+    def keys(self):
+        return range(len(self.array))
+
+    def values(self):
+        return self.array
+
+    def items(self):
+        return zip(range(len(self.array)), self.array.tolist())
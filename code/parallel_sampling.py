@@ -0,0 +1,169 @@
+import multiprocessing
+import numpy as np
+import graph_tools
+import shared_arrays
+import wedge_sampler
+import color_coding
+import triangle_counters
+import alias_sampler
+
+##### Reproducible parallel versions of the samplers of wedge_sampler.py (transitivity, cc, ccd) and
+##### color_coding.py. The samples are cut into batches of batch samples, and batch i draws from its own
+##### random generator, seeded by the i-th child of np.random.SeedSequence(seed). The batches are spread
+##### over a pool of worker processes, which read the graph from shared memory (see shared_arrays.py).
+##### Since the batches and their seeds only depend on the number of samples, batch and seed, the output
+##### is bit-for-bit the same for any number of workers (including workers=1, which does not start a pool).
+#####
+##### Every batch returns, for each estimated quantity (a cell), the number of samples, their mean, and the
+##### sum of squared deviations from the mean. These are merged in batch order with the parallel formula of
+##### Chan, Golub and LeVeque, which gives exactly the mean and variance of all samples together. Outputs
+##### are (estimate, standard error) pairs, where the standard error is sqrt(variance/samples).
+
+BATCH = 1 << 16         # Default number of samples per batch
+
+
+#### Statistics of the samples of one cell: [count, mean, M2], where M2 is the sum of squared deviations
+####
+
+def sample_stats(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.zeros(3)
+    mean = values.mean()
+    return np.array([len(values), mean, np.sum((values - mean)**2)])
+
+#### Merge the statistics a and b of two sets of samples
+####
+
+def merge_stats(a, b):
+    count = a[0] + b[0]
+    if count == 0:
+        return np.zeros(3)
+    delta = b[1] - a[1]
+    mean = a[1] + delta*b[0]/count
+    return np.array([count, mean, a[2] + b[2] + delta*delta*a[0]*b[0]/count])
+
+#### (estimate, standard error) from merged statistics
+####
+
+def estimate(stats):
+    [count, mean, m2] = stats
+    if count < 2:
+        return (float(mean), float('inf'))
+    return (float(mean), float(np.sqrt(m2/(count-1)/count)))
+
+
+#### Samplers. Each gets the graph, the random generator of the batch, the batch size and its parameters,
+#### and returns a list with the statistics of every cell.
+####
+
+# transitivity: is a wedge (picked u.a.r.) closed
+def _transitivity_batch(G, rng, size, params):
+    if not np.any(G.deg >= 2):      # No wedges, so transitivity is 1 (as in wedge_sampler)
+        return [sample_stats(np.ones(size))]
+    v = alias_sampler.get_sampler(G, 'wedge').Sample(size, rng)
+    return [sample_stats(wedge_sampler.check_random_edges(G, v, rng))]
+
+# cc: is a wedge at a vertex picked u.a.r. closed (0 if the vertex has degree less than 2)
+def _cc_batch(G, rng, size, params):
+    v = rng.integers(0, G.n, size)
+    values = np.zeros(size)
+    center = G.deg[v] >= 2
+    values[center] = wedge_sampler.check_random_edges(G, v[center], rng)
+    return [sample_stats(values)]
+
+# ccd: the same, for size vertices of degree exactly 2^i in each bin i
+def _ccd_batch(G, rng, size, params):
+    stats = []
+    for i in range(params['bins']):
+        vertices = alias_sampler.get_sampler(G, ('degree', 2**i))
+        if i == 0 or len(vertices.items) == 0:
+            stats.append(np.zeros(3))
+            continue
+        v = vertices.Sample(size, rng)
+        stats.append(sample_stats(wedge_sampler.check_random_edges(G, v, rng)))
+    return stats
+
+# color_coding: one estimate of the triangle count per coloring (9/2 times its colorful triangles, as in
+# color_coding.multi_color_coding). The size colorings of the batch are drawn from the batch generator, and evaluated
+# together by multi_color_coding, over the oriented graph that is built once per process.
+def _color_coding_batch(G, rng, size, params):
+    if 'dag' not in _worker:
+        _worker['dag'] = triangle_counters.oriented(G)
+    colorful = color_coding.multi_color_coding(_worker['dag'], size, rng)[2]
+    return [sample_stats(colorful*9/2.0)]
+
+SAMPLERS = {'transitivity': _transitivity_batch, 'cc': _cc_batch, 'ccd': _ccd_batch,
+            'color_coding': _color_coding_batch}
+
+
+#### Run samples samples of the sampler kind on G, in batches of batch, with workers processes (None for all cores).
+#### Output is the merged statistics of every cell.
+####
+
+def run(G, kind, samples, workers=None, seed=0, batch=BATCH, params=None):
+    G = wedge_sampler.as_csr(G)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    sizes = [min(batch, samples - first) for first in range(0, samples, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(kind, size, child, params or {}) for (size, child) in zip(sizes, seeds)]
+
+    if workers <= 1:
+        _set_graph(G)
+        results = [_run_batch(task) for task in tasks]
+    else:
+        [handles, spec] = shared_arrays.share_graph(G)
+        try:
+            pool = multiprocessing.Pool(workers, initializer=_attach_worker, initargs=(spec,))
+            try:
+                results = pool.map(_run_batch, tasks, chunksize=1)      # In batch order
+            finally:
+                pool.terminate()
+        finally:
+            shared_arrays.release(handles)
+
+    merged = None
+    for stats in results:
+        merged = stats if merged is None else [merge_stats(a, b) for (a, b) in zip(merged, stats)]
+    return merged
+
+_worker = {}        # State of a worker process (or of this process, with workers=1)
+
+def _set_graph(G):
+    _worker.clear()
+    _worker['G'] = G
+
+def _attach_worker(spec):
+    [handles, G, arrays] = shared_arrays.attach_graph(spec)
+    _set_graph(G)
+    _worker['handles'] = handles        # Keep the shared memory mapped
+
+def _run_batch(task):
+    (kind, size, child, params) = task
+    return SAMPLERS[kind](_worker['G'], np.random.default_rng(child), size, params)
+
+
+#### The parallel samplers. G: graph (undirected or DAG), the other arguments are as in run.
+####
+
+# fraction of closed wedges. Output is (estimate, standard error)
+def transitivity(G, sample_size, workers=None, seed=0, batch=BATCH):
+    return estimate(run(G, 'transitivity', sample_size, workers, seed, batch)[0])
+
+# average local clustering coefficient. Output is (estimate, standard error)
+def cc(G, sample_size, workers=None, seed=0, batch=BATCH):
+    return estimate(run(G, 'cc', sample_size, workers, seed, batch)[0])
+
+# cc(d) for all d that are powers of 2, with sample_size samples for each. Output is a list of (estimate, standard
+# error), where entry i is for degree 2^i ((0, 0) if there are no vertices of that degree)
+def ccd(G, sample_size, workers=None, seed=0, batch=BATCH):
+    G = wedge_sampler.as_csr(G)
+    max_deg = int(G.deg.max()) if G.n else 0
+    bins = int(np.log2(max_deg)) + 1 if max_deg > 0 else 1
+    stats = run(G, 'ccd', sample_size, workers, seed, batch, {'bins': bins})
+    return [estimate(cell) if cell[0] > 0 else (0.0, 0.0) for cell in stats]
+
+# average of runs color coding estimates of the number of triangles. Output is (estimate, standard error)
+def color_coding_count(G, runs, workers=None, seed=0, batch=16):
+    return estimate(run(G, 'color_coding', runs, workers, seed, batch)[0])
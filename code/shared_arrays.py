@@ -0,0 +1,71 @@
+import numpy as np
+from multiprocessing import shared_memory
+import graph_tools
+
+##### Helpers to put NumPy arrays in shared memory, so that the worker processes of a pool can read a big graph
+##### without each getting its own copy. The parent calls share() on a dict of arrays and passes the (small,
+##### picklable) spec to the workers, which call attach() to get NumPy views of the same memory.
+#####
+##### The parent owns the memory, and must call release() when the workers are done.
+
+
+#### Copy the arrays (a dict name -> array) into shared memory. Output is [handles, spec].
+####
+
+def share(arrays):
+    handles = []
+    spec = {}
+    for (name, array) in arrays.items():
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        handles.append(shm)
+        spec[name] = (shm.name, array.shape, array.dtype.str)
+    return [handles, spec]
+
+#### Attach to arrays shared by share(). Output is [handles, arrays], where arrays is a dict name -> array.
+#### The handles must be kept alive as long as the arrays are used.
+####
+
+def attach(spec):
+    handles = []
+    arrays = {}
+    for (name, (shm_name, shape, dtype)) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return [handles, arrays]
+
+#### Free shared memory created by share()
+####
+
+def release(handles):
+    for shm in handles:
+        shm.close()
+        shm.unlink()
+
+#### Share a csr_graph or csr_DAG G (with its sorted edge keys), and the arrays of the dict extra. Output is
+#### [handles, spec], as for share().
+####
+
+def share_graph(G, extra=None):
+    arrays = {'indptr': G.indptr, 'indices': G.indices, 'edge_keys': G._Edge_keys()}
+    if isinstance(G, graph_tools.csr_DAG):
+        arrays.update({'top_order': G.top_order, 'in_indptr': G.in_indptr, 'in_indices': G.in_indices})
+    arrays.update(extra or {})
+    return share(arrays)
+
+#### Attach to a graph shared by share_graph(). Output is [handles, G, arrays], where G is rebuilt on the shared
+#### arrays and arrays is the dict of all of them (the extra ones included).
+####
+
+def attach_graph(spec):
+    [handles, arrays] = attach(spec)
+    if 'top_order' in arrays:
+        G = graph_tools.csr_DAG(arrays['indptr'], arrays['indices'], arrays['top_order'], None,
+                                arrays['in_indptr'], arrays['in_indices'])
+    else:
+        G = graph_tools.csr_graph(arrays['indptr'], arrays['indices'])
+    G.edge_keys = arrays['edge_keys']
+    return [handles, G, arrays]
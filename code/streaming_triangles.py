@@ -0,0 +1,113 @@
+import random
+import graph_io
+
+##### Single-pass triangle estimation over a stream of edges, with a fixed amount of memory. This is
+##### TRIEST-IMPR (De Stefani, Epasto, Riondato, Upfal, KDD 2016): a reservoir of at most size edges
+##### is kept as a small graph. When edge (u,v) arrives, every common neighbor of u and v in the
+##### reservoir closes a triangle, which is counted with weight max(1, (t-1)(t-2)/(size(size-1))),
+##### the inverse of the probability that both other edges are in the reservoir (t is the number of
+##### edges seen so far). Then (u,v) enters the reservoir with probability size/t, replacing a random
+##### edge. The counters are unbiased estimates of the triangle counts at every point of the stream,
+##### and their variance goes down as size goes up. With size at least the number of edges, they are
+##### exact.
+#####
+##### The stream should have every edge once. Self loops are skipped.
+
+
+class triest(object):
+
+#### Initializing an empty reservoir of size edges (at least 2). With local=True, per-vertex estimates
+#### are also kept (this takes memory proportional to the number of vertices in triangles seen).
+####
+
+    def __init__(self,size,local=False,seed=None):
+        if size < 2:
+            raise ValueError('reservoir size must be at least 2')
+        self.size = size
+        self.t = 0                   # Number of edges seen
+        self.adj_list = dict()       # Adjacency list of the edges in the reservoir
+        self.edges = []              # Edges in the reservoir
+        self.triangles = 0.0         # Global estimate
+        self.local = dict() if local else None      # Per-vertex estimates
+        self.random = random.Random(seed)
+
+#### Process the next edge (node1, node2) of the stream
+####
+
+    def Add_edge(self,node1,node2):
+        if node1 == node2:
+            return
+        self.t += 1
+        nbrs1 = self.adj_list.get(node1)
+        nbrs2 = self.adj_list.get(node2)
+        if nbrs1 and nbrs2:
+            common = nbrs1 & nbrs2           # Triangles closed by this edge in the reservoir
+            if common:
+                t = float(self.t)
+                weight = max(1.0, (t-1)*(t-2)/(self.size*(self.size-1.0)))
+                self.triangles += weight*len(common)
+                if self.local is not None:
+                    local = self.local
+                    local[node1] = local.get(node1, 0.0) + weight*len(common)
+                    local[node2] = local.get(node2, 0.0) + weight*len(common)
+                    for node3 in common:
+                        local[node3] = local.get(node3, 0.0) + weight
+
+        if self.t <= self.size:              # Reservoir not full yet
+            self.edges.append((node1, node2))
+        elif self.random.random()*self.t < self.size:      # Keep the edge with probability size/t
+            i = self.random.randrange(self.size)
+            self._Remove(*self.edges[i])
+            self.edges[i] = (node1, node2)
+        else:
+            return
+        self.adj_list.setdefault(node1, set()).add(node2)
+        self.adj_list.setdefault(node2, set()).add(node1)
+
+    def _Remove(self,node1,node2):
+        for (u, v) in ((node1, node2), (node2, node1)):
+            self.adj_list[u].discard(v)
+            if not self.adj_list[u]:
+                del self.adj_list[u]
+
+#### Process all edges (node1, node2) of an iterable. If every > 0, the estimate is printed
+#### after every every edges.
+####
+
+    def Add_edges(self,edges,every=0):
+        for (node1, node2) in edges:
+            self.Add_edge(node1,node2)
+            if every > 0 and self.t % every == 0:
+                print('edges =', self.t, ', triangle estimate =', self.triangles)
+        return self
+
+#### Process the edges of a file in the format of graph.Read_edges, in chunks. If the file lists every
+#### edge in both directions (like email-Enron.txt), use symmetric=True to keep one copy of each.
+####
+
+    def Read_edges(self,fname,sep=None,symmetric=False,every=0):
+        for [u, v, raw] in graph_io.read_edge_chunks(fname, sep):
+            if symmetric:
+                keep = u < v
+                u = u[keep]
+                v = v[keep]
+            self.Add_edges(zip(u.tolist(), v.tolist()), every)
+        return self
+
+#### Current estimates. Estimate() is the number of triangles, and Local() the dict of per-vertex
+#### estimates (vertices in no triangle seen are left out).
+####
+
+    def Estimate(self):
+        return self.triangles
+
+    def Local(self):
+        return self.local
+
+
+#### Estimate the triangles of the edge file fname with a reservoir of size edges in one pass.
+#### Output is the triest object, for Estimate() and Local().
+####
+
+def triest_file(fname,size,sep=None,symmetric=False,local=False,seed=None,every=0):
+    return triest(size, local, seed).Read_edges(fname, sep, symmetric, every)
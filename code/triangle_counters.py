@@ -1,5 +1,9 @@
 import itertools
 import sys
+import multiprocessing
+import numpy as np
+import graph_tools
+import shared_arrays
 
 
 ##### This file contains different functions to find triangles in a graph.
@@ -13,6 +17,8 @@ import sys
 #### 
 
 def wedge_enum(G, wedges=False):
+    if isinstance(G, graph_tools.csr_graph):     # Same output from the array kernels (see _wedge_enum_csr)
+        return _wedge_enum_csr(G, wedges)
     wedge_cnt = 0.0
     closed = 0.0              # Initialize number of closed wedges
     for node1 in G.vertices:     # Loop over all nodes
@@ -32,6 +38,8 @@ def wedge_enum(G, wedges=False):
 #### gives the number of triangles incident to each (directed) edge.
 
 def triangle_info(DAG):
+    if isinstance(DAG, graph_tools.csr_DAG):     # Same output from the array kernels (see _triangle_info_csr)
+        return _triangle_info_csr(DAG)
     tri_vertex = {}         # Output structures
     tri_edge = {}
 
@@ -87,3 +95,408 @@ def get_edge_set(G):
 				edge_set.add((node1, node2))
 
 	return edge_set
+
+
+#### Array-based triangle counting on oriented graphs (compact-forward).
+####
+#### Let D be a csr_DAG (see graph_tools.py), where every out-list is sorted by position in the ordering. Every triangle
+#### has a unique lowest vertex u, middle vertex v and highest vertex w, and is found exactly once from the out-edge (u,v),
+#### as a common out-neighbor w of u and v. Since the out-list of u is sorted, the candidates for w are either the vertices
+#### after v in the out-list of u, or the out-list of v. For each edge we take the shorter of the two and look up each
+#### candidate in the (sorted) other list. Over the degeneracy orientation, this is O(m * degeneracy) work, and it is done
+#### on whole blocks of edges at once with NumPy.
+####
+#### Triangles are represented by the positions of their three edges in D.indices, [e_uv, e_uw, e_vw].
+
+BLOCK = 1 << 22         # Number of lookups done at once (bounds the memory of the kernels)
+
+#### The oriented graph that the array kernels run on. A csr_DAG is used as is, a DAG is converted, and an undirected
+#### graph or csr_graph is oriented by its degeneracy ordering.
+####
+
+def oriented(G):
+    if isinstance(G, graph_tools.csr_DAG):
+        return G
+    if isinstance(G, graph_tools.DAG):
+        return G.To_csr()
+    if not isinstance(G, graph_tools.csr_graph):
+        G = G.To_csr()
+    return G.DegenOrder()
+
+# Arrays used by the kernels, for every out-edge: the source, the rank of the target, the sorted edge key
+# (source, rank of target), and the number of lookups needed for it
+def _edge_arrays(D):
+    n = D.n
+    src = np.repeat(np.arange(n), D.deg)
+    rtarget = D.top_order_inv[D.indices]
+    keys = src*n + rtarget                      # Sorted, since out-lists are sorted by rank
+    tail = D.indptr[src+1] - np.arange(len(src)) - 1     # Number of vertices after the target in the out-list of src
+    work = np.minimum(tail, D.deg[D.indices])
+    return [src, rtarget, keys, work]
+
+# Split the out-edges of vertices start,...,end-1 into blocks of at most about block lookups each
+def _edge_blocks(D, work, start, end, block):
+    lo = D.indptr[start]
+    hi = D.indptr[end]
+    total = np.cumsum(work[lo:hi])
+    cuts = np.searchsorted(total, np.arange(block, total[-1] if len(total) else 0, block), side='right')
+    bounds = [lo] + [lo + int(cut) for cut in cuts] + [hi]
+    return [(a, b) for (a, b) in zip(bounds[:-1], bounds[1:]) if b > a]
+
+# For positions first[i] and lengths counts[i], list (i repeated, first[i], first[i]+1, ..., first[i]+counts[i]-1)
+def _expand(first, counts):
+    starts = np.repeat(first - np.cumsum(counts) + counts, counts)
+    return [np.repeat(np.arange(len(first)), counts), starts + np.arange(int(counts.sum()))]
+
+# Look up keys wanted in the sorted array keys. Output is the positions, and which were found.
+def _lookup(keys, wanted):
+    pos = np.searchsorted(keys, wanted)
+    pos[pos == len(keys)] = 0
+    return [pos, keys[pos] == wanted]
+
+#### How the kernels intersect two sorted lists, the rest of u's out-list after v and the out-list of v, is chosen per
+#### edge (u,v) by the lengths of the lists. If the longer list is the out-list of a hub (a vertex with at least
+#### HUB_DEGREE out-neighbors), its neighborhood is kept as a bitmap and every candidate is one lookup in it. Otherwise,
+#### lists whose lengths are within a factor MERGE_RATIO are merged, and the shorter list of a skewed pair is binary
+#### searched in the longer one. The paths are 'bitmap', 'merge' and 'search'. Bitmaps are built for the largest hubs
+#### that fit in BITMAP_BYTES. On the graphs in graphs/, merging (a stable sort in NumPy) only pays off for lists of
+#### equal length, so that is the default.
+####
+#### If a dict stats is given, stats[path] = [pairs, lookups] counts the edges that took each path, and the number of
+#### list entries they looked at. This is what the thresholds should be tuned on.
+
+MERGE_RATIO = 1
+HUB_DEGREE = 256
+BITMAP_BYTES = 1 << 26
+
+# Bitmaps of the out-neighborhoods (by rank) of the hubs. Output is [hub_row, bitmap], where hub_row[v] is the row of
+# v in bitmap, or -1 if v has no bitmap.
+def _hub_bitmaps(D, rtarget):
+    hubs = np.flatnonzero(D.deg >= HUB_DEGREE)
+    hubs = hubs[np.argsort(-D.deg[hubs], kind='stable')][:BITMAP_BYTES // max(D.n, 1)]    # Largest hubs first
+    hub_row = np.full(D.n, -1, dtype=np.int64)
+    hub_row[hubs] = np.arange(len(hubs))
+    bitmap = np.zeros((len(hubs), D.n), dtype=bool)
+    for (row, hub) in enumerate(hubs):
+        bitmap[row, rtarget[D.indptr[hub]:D.indptr[hub+1]]] = True
+    return [hub_row, bitmap]
+
+def _add_stats(stats, path, pairs, lookups):
+    if stats is not None:
+        counts = stats.setdefault(path, [0, 0])
+        counts[0] += pairs
+        counts[1] += int(lookups)
+
+#### Generator over the triangles with lowest vertex in start,...,end-1, in blocks [e_uv, e_uw, e_vw] of edge positions.
+####
+
+def triangle_blocks(D, start=0, end=None, block=BLOCK, edge_arrays=None, stats=None, hubs=None):
+    if end is None:
+        end = D.n
+    if edge_arrays is None:
+        edge_arrays = _edge_arrays(D)
+    [src, rtarget, keys, work] = edge_arrays
+    if hubs is None:
+        hubs = _hub_bitmaps(D, rtarget)
+    [hub_row, bitmap] = hubs
+    for (a, b) in _edge_blocks(D, work, start, end, block):
+        edges = np.arange(a, b)
+        edges = edges[work[edges] > 0]                  # Edges with an empty list have no triangles
+        targets = D.indices[edges]
+        tail = D.indptr[src[edges]+1] - edges - 1       # Length of the rest of u's out-list
+        short_tail = tail < D.deg[targets]
+        longer = np.where(short_tail, D.deg[targets], tail)
+        hub = hub_row[np.where(short_tail, targets, src[edges])] >= 0        # Is the longer list a hub's?
+        merge = ~hub & (longer <= MERGE_RATIO*work[edges])
+
+        parts = [_search_tail(D, edge_arrays, edges[short_tail & ~hub & ~merge], stats),
+                 _search_out(D, edge_arrays, edges[~short_tail & ~hub & ~merge], stats),
+                 _merge(D, edge_arrays, edges[merge], stats),
+                 _bitmap_tail(D, edge_arrays, edges[short_tail & hub], hub_row, bitmap, stats),
+                 _bitmap_out(D, edge_arrays, edges[~short_tail & hub], hub_row, bitmap, stats)]
+        yield [np.concatenate([part[i] for part in parts]) for i in range(3)]
+
+# Search path: look up the rest of u's out-list in v's out-list
+def _search_tail(D, edge_arrays, e_uv, stats):
+    [src, rtarget, keys, work] = edge_arrays
+    [i, e_uw] = _expand(e_uv+1, work[e_uv])
+    _add_stats(stats, 'search', len(e_uv), len(e_uw))
+    e_uv = e_uv[i]
+    [e_vw, found] = _lookup(keys, D.indices[e_uv].astype(np.int64)*D.n + rtarget[e_uw])
+    return [e_uv[found], e_uw[found], e_vw[found]]
+
+# Search path: look up v's out-list in u's out-list
+def _search_out(D, edge_arrays, e_uv, stats):
+    [src, rtarget, keys, work] = edge_arrays
+    [i, e_vw] = _expand(D.indptr[D.indices[e_uv]], work[e_uv])
+    _add_stats(stats, 'search', len(e_uv), len(e_vw))
+    e_uv = e_uv[i]
+    [e_uw, found] = _lookup(keys, src[e_uv]*D.n + rtarget[e_vw])
+    return [e_uv[found], e_uw[found], e_vw[found]]
+
+# Merge path: both lists of every edge are tagged by the edge and sorted together. Each side is already one sorted
+# run, so the stable sort is a linear merge, and a common neighbor shows up as two equal neighbors (u's side first).
+def _merge(D, edge_arrays, e_uv, stats):
+    [src, rtarget, keys, work] = edge_arrays
+    targets = D.indices[e_uv]
+    [i_u, p_u] = _expand(e_uv+1, D.indptr[src[e_uv]+1] - e_uv - 1)
+    [i_v, p_v] = _expand(D.indptr[targets], D.deg[targets])
+    _add_stats(stats, 'merge', len(e_uv), len(p_u) + len(p_v))
+    tagged = np.concatenate((i_u*D.n + rtarget[p_u], i_v*D.n + rtarget[p_v]))
+    order = np.argsort(tagged, kind='stable')
+    common = np.flatnonzero(tagged[order[1:]] == tagged[order[:-1]])
+    first = order[common]                   # Entry from u's list
+    positions = np.concatenate((p_u, p_v))
+    return [e_uv[i_u[first]], positions[first], positions[order[common+1]]]
+
+# Bitmap path: v is a hub, so check the rest of u's out-list in the bitmap of v
+def _bitmap_tail(D, edge_arrays, e_uv, hub_row, bitmap, stats):
+    [src, rtarget, keys, work] = edge_arrays
+    [i, e_uw] = _expand(e_uv+1, work[e_uv])
+    _add_stats(stats, 'bitmap', len(e_uv), len(e_uw))
+    e_uv = e_uv[i]
+    targets = D.indices[e_uv]
+    found = bitmap[hub_row[targets], rtarget[e_uw]]
+    [e_uv, e_uw] = [e_uv[found], e_uw[found]]
+    return [e_uv, e_uw, _lookup(keys, targets[found].astype(np.int64)*D.n + rtarget[e_uw])[0]]
+
+# Bitmap path: u is a hub, so check v's out-list in the bitmap of u. A vertex of v's out-list comes after v, so if it
+# is in u's out-list, it is in the rest of it.
+def _bitmap_out(D, edge_arrays, e_uv, hub_row, bitmap, stats):
+    [src, rtarget, keys, work] = edge_arrays
+    [i, e_vw] = _expand(D.indptr[D.indices[e_uv]], work[e_uv])
+    _add_stats(stats, 'bitmap', len(e_uv), len(e_vw))
+    e_uv = e_uv[i]
+    found = bitmap[hub_row[src[e_uv]], rtarget[e_vw]]
+    [e_uv, e_vw] = [e_uv[found], e_vw[found]]
+    return [e_uv, _lookup(keys, src[e_uv]*D.n + rtarget[e_vw])[0], e_vw]
+
+#### compact_forward(G) counts triangles with triangle_blocks. G can be a graph, csr_graph, DAG or csr_DAG (see oriented).
+#### Output is the exact number of triangles. With wedges=True, output is (triangles, wedges), where wedges is the
+#### number of out-out wedges of the oriented graph, which is what wedge_enum(D, wedges=True) reports for the DAG.
+#### stats is filled as in triangle_blocks.
+
+def compact_forward(G, wedges=False, stats=None):
+    D = oriented(G)
+    triangles = 0
+    for [e_uv, e_uw, e_vw] in triangle_blocks(D, stats=stats):
+        triangles += len(e_uv)
+    if wedges:
+        return (triangles, int(np.sum(D.deg*(D.deg-1))//2))
+    return triangles
+
+#### triangle_arrays(G) is the array version of triangle_info, computed with triangle_blocks on the oriented graph
+#### D = oriented(G). Output is [D, tri_vertex, tri_edge], where tri_vertex[v] is the number of triangles containing
+#### vertex v of D, and tri_edge[e] is the number of triangles containing the edge at position e of D.indices. Since D
+#### has every edge of G once (as an out-edge), every undirected edge gets one count. Names are in D.labels.
+
+def triangle_arrays(G, stats=None):
+    D = oriented(G)
+    tri_vertex = np.zeros(D.n, dtype=np.int64)
+    tri_edge = np.zeros(len(D.indices), dtype=np.int64)
+    edge_arrays = _edge_arrays(D)
+    for [e_uv, e_uw, e_vw] in triangle_blocks(D, edge_arrays=edge_arrays, stats=stats):
+        _add_vertex_counts(D, edge_arrays[0], e_uv, e_uw, tri_vertex)
+        for e in (e_uv, e_uw, e_vw):
+            tri_edge += np.bincount(e, minlength=len(tri_edge))
+    return [D, tri_vertex, tri_edge]
+
+# wedge_enum for a csr_graph or csr_DAG. Every triangle closes 3 wedges of an undirected graph, and exactly 1 out-out
+# wedge of a DAG (at its lowest vertex).
+def _wedge_enum_csr(G, wedges):
+    closed = float(compact_forward(G))
+    if not isinstance(G, graph_tools.csr_DAG):
+        closed *= 3
+    if wedges:
+        return (closed, float(np.sum(G.deg*(G.deg-1))//2))
+    return closed
+
+# triangle_info for a csr_DAG, as dicts keyed by vertex IDs and by (directed) edges in both directions
+def _triangle_info_csr(D):
+    [D, tri_vertex, tri_edge] = triangle_arrays(D)
+    src = np.repeat(np.arange(D.n), D.deg).tolist()
+    dst = D.indices.tolist()
+    counts = tri_edge.astype(np.float64).tolist()
+    tri_edges = dict(zip(zip(src, dst), counts))
+    tri_edges.update(zip(zip(dst, src), counts))
+    return [dict(enumerate(tri_vertex.astype(np.float64).tolist())), tri_edges]
+
+# Add the triangles (given by e_uv and e_uw) to the counts of their three vertices u, v and w
+def _add_vertex_counts(D, src, e_uv, e_uw, tri_vertex):
+    for corner in (src[e_uv], D.indices[e_uv], D.indices[e_uw]):
+        tri_vertex += np.bincount(corner, minlength=D.n)
+
+
+#### local_clustering(G, fname='') gives the exact local clustering coefficient of every vertex, the number of triangles
+#### containing it divided by {d \choose 2} (0 if the degree is less than 2). Vertices are those of D = oriented(G).
+#### Output is [D, degree, tri_vertex, cc] of arrays; cc.mean() is what wedge_sampler.cc estimates. If fname is given,
+#### the lines "vertex,degree,triangles,cc" are also written there, a chunk of vertices at a time.
+
+CHUNK = 1 << 16         # Number of vertices written at once
+
+def local_clustering(G, fname=''):
+    [D, tri_vertex, tri_edge] = triangle_arrays(G)
+    degree = D.deg + D.indeg            # Degrees in G are out-degree plus in-degree
+    wedges = degree*(degree-1)//2
+    cc = np.zeros(D.n)
+    np.divide(tri_vertex, wedges, out=cc, where=wedges > 0)
+    if fname != '':
+        with open(fname,'w') as f_output:
+            for first in range(0, D.n, CHUNK):
+                last = min(first + CHUNK, D.n)
+                names = D.labels[first:last] if D.labels is not None else range(first, last)
+                f_output.writelines(str(name)+','+str(d)+','+str(t)+','+"{0:.6f}".format(c)+'\n'
+                                    for (name, d, t, c) in zip(names, degree[first:last].tolist(),
+                                                               tri_vertex[first:last].tolist(), cc[first:last].tolist()))
+    return [D, degree, tri_vertex, cc]
+
+#### exact_ccd(G, fname='') is the exact version of wedge_sampler.ccd: entry i is the average local clustering
+#### coefficient of the vertices of degree exactly 2^i (0 if there are none, and for i = 0). The output list and the
+#### file written to fname are in the same format as ccd. G can also be the output of local_clustering.
+
+def exact_ccd(G, fname=''):
+    if isinstance(G, list):
+        [D, degree, tri_vertex, cc] = G
+    else:
+        [D, degree, tri_vertex, cc] = local_clustering(G)
+    counts = np.bincount(degree)
+    sums = np.bincount(degree, weights=cc)
+    max_deg = len(counts) - 1
+    n = int(np.log2(max_deg)) + 1 if max_deg > 0 else 1      # n = number of ds for which ccd is calculated
+    ccdlist = [0]*(n)
+
+    d = 2
+    for i in range(1,n):
+        if counts[d] > 0:
+            ccdlist[i] = float(sums[d]/counts[d])
+            print('d = ', d, 'ccd = ', "{0:.2f}".format(ccdlist[i]))
+        d = d*2
+
+    if fname != '':                                         # If file name is actually given
+        with open(fname,'w') as f_output:
+            d = 1
+            for i in range(n):                              # Write out each count in separate line
+                f_output.write(str(d)+','+str("{0:.2f}".format(ccdlist[i]))+'\n')
+                d = d * 2
+    return ccdlist
+
+
+#### Multi-core triangle counting. The oriented graph, with the edge arrays and hub bitmaps of triangle_blocks (built
+#### once, here), is put in shared memory, and the vertices are split into ranges that are handed to a pool of worker
+#### processes. The ranges are balanced by the number of lookups of their out-edges (which is at most the number of
+#### out-wedges), not by the number of vertices, since a few vertices can have most of the work. There are several
+#### ranges per worker so that the pool can even out the rest.
+####
+#### Output is the number of triangles. With per_vertex=True, output is (triangles, tri_vertex), where tri_vertex[v] is
+#### the number of triangles containing vertex v of the oriented graph oriented(G) (names are in its labels).
+
+def parallel_triangle_count(G, workers=None, per_vertex=False, ranges_per_worker=4):
+    D = oriented(G)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    edge_arrays = _edge_arrays(D)
+    ranges = _work_ranges(D, edge_arrays[3], workers*ranges_per_worker)
+
+    D.edge_keys = edge_arrays[2]        # The same keys, sorted by source and rank of target
+    [hub_row, bitmap] = _hub_bitmaps(D, edge_arrays[1])         # Built once, and read by all workers
+    extra = {'src': edge_arrays[0], 'rtarget': edge_arrays[1], 'work': edge_arrays[3],
+             'hub_row': hub_row, 'bitmap': bitmap}
+    [handles, spec] = shared_arrays.share_graph(D, extra)
+    try:
+        pool = multiprocessing.Pool(workers, initializer=_attach_worker, initargs=(spec,))
+        try:
+            results = pool.map(_count_range, [(start, end, per_vertex) for (start, end) in ranges], chunksize=1)
+        finally:
+            pool.terminate()
+    finally:
+        shared_arrays.release(handles)
+
+    triangles = sum(result[0] for result in results)
+    if per_vertex:
+        tri_vertex = np.zeros(D.n, dtype=np.int64)
+        for (count, touched, counts) in results:
+            tri_vertex[touched] += counts
+        return (triangles, tri_vertex)
+    return triangles
+
+# Split the vertices into at most num ranges (start, end) with about the same lookup work
+def _work_ranges(D, work, num):
+    edge_total = np.concatenate(([0], np.cumsum(work, dtype=np.int64)))
+    total = edge_total[D.indptr[1:]]        # total[v] = work of the out-edges of vertices 0..v
+    num = max(1, num)
+    cuts = np.searchsorted(total, np.arange(1, num)*(edge_total[-1]/float(num)), side='right')
+    bounds = sorted(set([0] + cuts.tolist() + [D.n]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+_worker = {}        # State of a worker process of parallel_triangle_count
+
+def _attach_worker(spec):
+    [handles, D, arrays] = shared_arrays.attach_graph(spec)
+    _worker['handles'] = handles        # Keep the shared memory mapped
+    _worker['D'] = D
+    _worker['edge_arrays'] = [arrays['src'], arrays['rtarget'], arrays['edge_keys'], arrays['work']]
+    _worker['hubs'] = [arrays['hub_row'], arrays['bitmap']]
+    _worker['tri_vertex'] = None
+
+# Count the triangles of one range. With per_vertex, the counts are added up in one array per worker, and only the
+# (vertex, count) pairs touched by the range are returned.
+def _count_range(args):
+    (start, end, per_vertex) = args
+    D = _worker['D']
+    src = _worker['edge_arrays'][0]
+    triangles = 0
+    if per_vertex and _worker['tri_vertex'] is None:
+        _worker['tri_vertex'] = np.zeros(D.n, dtype=np.int64)
+    tri_vertex = _worker['tri_vertex']
+    for [e_uv, e_uw, e_vw] in triangle_blocks(D, start, end, edge_arrays=_worker['edge_arrays'], hubs=_worker['hubs']):
+        triangles += len(e_uv)
+        if per_vertex:
+            _add_vertex_counts(D, src, e_uv, e_uw, tri_vertex)
+    if not per_vertex:
+        return (triangles, None, None)
+    touched = np.flatnonzero(tri_vertex)
+    counts = tri_vertex[touched]
+    tri_vertex[touched] = 0             # Ready for the next range of this worker
+    return (triangles, touched, counts)
+
+
+#### Triangle listing. list_triangles(D) is a generator over the triangles of the oriented graph D (see oriented), in
+#### NumPy arrays of at most about block rows (u, v, w), with u before v before w in the ordering. Only triangles whose
+#### lowest vertex is in start,...,end-1 are listed, so disjoint vertex ranges (see triangle_shards) list disjoint
+#### parts of the triangle set, and can be handed to different workers. Rows are vertices of D; names are in D.labels.
+####
+#### If G is not oriented yet, orient it once and pass the csr_DAG, so that all shards use the same vertex numbering.
+
+def list_triangles(D, start=0, end=None, block=BLOCK):
+    D = oriented(D)
+    edge_arrays = _edge_arrays(D)
+    src = edge_arrays[0]
+    for [e_uv, e_uw, e_vw] in triangle_blocks(D, start, end, block, edge_arrays=edge_arrays):
+        yield np.column_stack((src[e_uv], D.indices[e_uv], D.indices[e_uw])).astype(D.indices.dtype)
+
+#### Vertex ranges [(start, end),...] for list_triangles, splitting the work of listing the triangles of D into about
+#### equal shards.
+####
+
+def triangle_shards(D, shards):
+    D = oriented(D)
+    return _work_ranges(D, _edge_arrays(D)[3], shards)
+
+#### write_triangles(D, fname) writes the triangles of list_triangles(D, start, end) to fname, as they are listed.
+#### By default, every line has the names of the three vertices, separated by spaces (like the edge files). With
+#### binary=True, the rows of vertex IDs are written as raw integers of type D.indices.dtype, which can be read back
+#### with np.fromfile(fname, dtype).reshape(-1, 3). Output is the number of triangles written.
+
+def write_triangles(D, fname, start=0, end=None, binary=False, block=BLOCK):
+    D = oriented(D)
+    names = np.asarray(D.labels) if (D.labels is not None and not binary) else None
+    count = 0
+    with open(fname, 'wb' if binary else 'w') as f_output:
+        for rows in list_triangles(D, start, end, block):
+            count += len(rows)
+            if binary:
+                rows.tofile(f_output)
+            elif len(rows):
+                text = (rows if names is None else names[rows]).astype(str).astype(object)
+                f_output.write('\n'.join(text[:,0] + ' ' + text[:,1] + ' ' + text[:,2]) + '\n')
+    return count
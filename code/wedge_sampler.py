@@ -5,6 +5,7 @@ import scipy.misc as scm
 import wedge_sampler as wg
 import operator
 import datetime
+import alias_sampler
 
 ##### Compute the cc(d)/cc/transitivity of a graph by wedge sampling
 #####
@@ -16,19 +17,17 @@ import datetime
 ### cc(d) & cc
 ###
 
-# G: graph (undirected or DAG), sorted_vertices: vertices sorted by degree,
-# start and end are indices of the start and end of the degree d vertices in sorted_vertices
+# G: graph (undirected or DAG), vertex_sampler: sampler of the degree d vertices (see alias_sampler.py),
 # sample_size: the number of vertices sampled
 #
 # samples a degree d vertex u.a.r., samples a wedge sourced at the vertex u.a.r., checks if it is closed
 # repeats this sample_size times and returns the number of closed wedges as an estimate for ccd
 
-def ccd_sampled(G, sorted_vertices, start, end, sample_size):
+def ccd_sampled(G, vertex_sampler, sample_size):
 
 	closed = 0
 	for i in range(sample_size):
-		index = np.random.randint(start, end + 1)			# pick a vertex u.a.r.
-		v = sorted_vertices[index][0]
+		v = vertex_sampler.Sample()							# pick a vertex u.a.r.
 		closed = closed + wg.check_random_edge(G,v)			# pick a wedge with the vertex as the source u.a.r. and check if it is closed
 	return closed / float(sample_size)						# return the fraction of closed wedges as an estimate for cc(d)
 
@@ -38,13 +37,10 @@ def ccd_sampled(G, sorted_vertices, start, end, sample_size):
 
 def ccd(G, sample_size, fname=''):
 
-	sorted_vertices = sorted(G.degrees.items(), key = lambda x: x[1])
-
 	degs = list((G.degrees).values())						# List of degrees
 	dbins = np.bincount(degs)			 					# dbins[i] gives the count of vertices of degree i
 
 	d = 2
-	start = dbins[0]
 	max_deg = len(dbins) -1
 	n = int(np.log2(max_deg)) + 1							# n = number of ds for which ccd is to be calculated
 	ccdlist = [0]*(n)
@@ -54,9 +50,7 @@ def ccd(G, sample_size, fname=''):
 			d = d*2
 			continue
 		else:
-			start = start + sum(dbins[(d/2):d])
-			end = start + dbins[d] - 1
-			ccdlist[i] = ccd_sampled(G, sorted_vertices, start, end, sample_size)
+			ccdlist[i] = ccd_sampled(G, alias_sampler.get_sampler(G, ('degree', d)), sample_size)	# sampler of the degree d vertices, cached on G
 			print('d = ', d, 'ccd = ', "{0:.2f}".format(ccdlist[i]))
 			d = d*2
 
@@ -76,8 +70,9 @@ def ccd(G, sample_size, fname=''):
 
 def cc(G, sample_size, fname=''):
 	closed = 0
+	vertex_sampler = alias_sampler.get_sampler(G, 'vertex')		# cached on G
 	for i in range(sample_size):
-		v = random.choice(G.degrees.keys())					# pick a vertex u.a.r.
+		v = vertex_sampler.Sample()							# pick a vertex u.a.r.
 		if G.degrees[v] < 2:								# if the degree of the vertex is less than 2, its contribution to cc will be 0
 			continue
 		closed = closed + wg.check_random_edge(G,v)			# pick a wedge with the vertex as the source u.a.r. and check if it is closed
@@ -91,44 +86,146 @@ def cc(G, sample_size, fname=''):
 		f_input.close()
 	return cc
 
+# Adaptive versions of ccd and cc. Instead of a fixed number of samples, wedges are sampled in vectorized batches
+# until the confidence interval of every estimate is at most width wide, or budget samples have been used.
+# The interval is estimate +- z*sqrt(p(1-p)/samples), where p = (closed+1)/(samples+2), so estimates of 0 or 1 still
+# get a positive width. For ccd, every round is spread over the bins that are not done, in proportion to the
+# number of samples each still needs (which is larger for noisy bins), so the budget goes where the variance is.
+
+# half width of the confidence interval, and number of samples needed for half width h
+def _half_width(closed, samples, z):
+    p = (closed+1.0)/(samples+2.0)
+    return z*np.sqrt(p*(1-p)/np.maximum(samples, 1))
+
+def _samples_needed(closed, samples, z, h):
+    p = (closed+1.0)/(samples+2.0)
+    return np.ceil(z*z*p*(1-p)/(h*h))
+
+# G: graph (undirected or DAG), width: target width of the confidence intervals, budget: total number of samples,
+# batch: samples per bin and round, z: z-score of the intervals (1.96 is 95%), seed: seed of the random generator,
+# fname: name of file to write the values to
+# output is [ccdlist, cilist, samples] for all d that are powers of 2, as in ccd: ccdlist[i] is the estimate for degree
+# 2^i, cilist[i] its interval (low, high), and samples[i] the number of samples used for it
+def adaptive_ccd(G, width=0.02, budget=10**6, batch=1000, z=1.96, seed=None, fname=''):
+	G = as_csr(G)
+	rng = np.random.default_rng(seed)
+	deg = G.deg
+
+	max_deg = int(deg.max()) if G.n else 0
+	n = int(np.log2(max_deg)) + 1 if max_deg > 0 else 1		# n = number of ds for which ccd is to be calculated
+	bins = [alias_sampler.get_sampler(G, ('degree', 2**i)) for i in range(n)]	# samplers of the vertices of degree exactly 2^i
+	active = np.array([i > 0 and len(bins[i].items) > 0 for i in range(n)])
+	closed = np.zeros(n)
+	samples = np.zeros(n)
+	used = 0
+
+	allot = np.where(active, batch, 0)						# first round: batch samples for every bin
+	while used < budget and allot.sum() > 0:
+		allot = np.floor(allot*min(1.0, (budget - used)/float(allot.sum())))
+		for i in np.flatnonzero(allot):
+			v = bins[i].Sample(int(allot[i]), rng)				# pick vertices of the bin u.a.r.
+			closed[i] += np.count_nonzero(check_random_edges(G, v, rng))
+			samples[i] += allot[i]
+		used += int(allot.sum())
+		if allot.sum() == 0:
+			break
+		active &= _half_width(closed, samples, z) > width/2.0
+		need = np.where(active, np.maximum(_samples_needed(closed, samples, z, width/2.0) - samples, 1), 0)
+		if need.sum() > 0:
+			allot = np.minimum(need, np.ceil(need*batch*np.count_nonzero(active)/need.sum()))	# spread batch per open bin
+		else:
+			allot = need
+
+	ccdlist = [0.0]*n
+	cilist = [(0.0, 0.0)]*n
+	for i in np.flatnonzero(samples):
+		ccdlist[i] = float(closed[i]/samples[i])
+		h = float(_half_width(closed[i], samples[i], z))
+		cilist[i] = (max(0.0, ccdlist[i]-h), min(1.0, ccdlist[i]+h))
+		print('d = ', 2**i, 'ccd = ', "{0:.2f}".format(ccdlist[i]), '+-', "{0:.3f}".format(h), 'samples = ', int(samples[i]))
+
+	if fname != '':											# If file name is actually given
+		f_input = open(fname,'w')
+		for i in range(n):									# Write out each estimate in separate line
+			f_input.write(str(2**i)+','+"{0:.2f}".format(ccdlist[i])+','+"{0:.3f}".format(cilist[i][0])+','+"{0:.3f}".format(cilist[i][1])+','+str(int(samples[i]))+'\n')
+		f_input.close()
+
+	return [ccdlist, cilist, [int(k) for k in samples]]
+
+# G: graph (undirected or DAG), other arguments as for adaptive_ccd
+# samples vertices u.a.r. and a wedge at each, until the confidence interval of cc is at most width wide
+# output is (cc, (low, high), samples)
+def adaptive_cc(G, width=0.02, budget=10**6, batch=10000, z=1.96, seed=None, fname=''):
+	G = as_csr(G)
+	rng = np.random.default_rng(seed)
+	closed = 0
+	samples = 0
+	while G.n > 0 and samples < budget:						# an empty graph has nothing to sample, and cc = 0
+		size = min(batch, budget - samples)
+		v = rng.integers(0, G.n, size)						# pick vertices u.a.r.
+		v = v[G.deg[v] >= 2]								# vertices of degree less than 2 contribute 0
+		closed += np.count_nonzero(check_random_edges(G, v, rng))
+		samples += size
+		if _half_width(closed, samples, z) <= width/2.0:
+			break
+
+	cc = closed / float(samples) if samples > 0 else 0.0
+	h = float(_half_width(closed, samples, z)) if samples > 0 else 0.0
+	print('cc = ', cc, '+-', h, 'samples = ', samples)
+
+	if fname != '':
+		f_input = open(fname,'w')
+		f_input.write(str("{0:.2f}".format(cc))+','+"{0:.3f}".format(max(0.0, cc-h))+','+"{0:.3f}".format(min(1.0, cc+h))+','+str(samples)+'\n')
+		f_input.close()
+	return (cc, (max(0.0, cc-h), min(1.0, cc+h)), samples)
+
 ###
 ### transitivity
 ###
 
-# G: graph (undirected or DAG), sample_size: the number of wedges sampled
+# G: graph (undirected or DAG), sample_size: the number of wedges sampled, seed: seed of the random generator
 # return the fraction of wedges that are closed
-def transitivity(G, sample_size):
-    closed = 0              # Initialize number of closed wedges
-    [n, m , wedges] = G.Size()
-
+#
+# the samples are drawn in batches of at most batch with NumPy, on the CSR arrays of G (G is converted once if it is
+# not a csr_graph or csr_DAG)
+def transitivity(G, sample_size, seed=None, batch=1<<22):
+    G = as_csr(G)
+    rng = np.random.default_rng(seed)
+
+    deg = G.deg.astype(np.int64)
+    wedges = int(np.sum(deg*(deg-1)//2))
     if wedges == 0:
         return 1
+    centers = alias_sampler.get_sampler(G, 'wedge')      # sampler of wedge centers, cached on G
 
-    deg_table = list()
-
-    sum_wedges = 0
-
-    # build the degree table, wherein each element is (sum_wedges, node id), to facilitate sampling
-    for node1 in G.vertices:     # Loop over all nodes
-        deg = len(G.adj_list[node1])
-        if deg < 2:
-            continue
+    closed = 0              # Initialize number of closed wedges
+    for first in range(0, sample_size, batch):
+        size = min(batch, sample_size - first)
+        # select vertices v with probability prop. to (deg(v) choose 2)
+        v = centers.Sample(size, rng)
+        # then pick two neighbors of v and check if they are connected by some edge
+        closed += int(np.count_nonzero(check_random_edges(G, v, rng)))
 
-        deg_table.append((sum_wedges, node1))
-        sum_wedges +=  deg*(deg-1)/2
+    return closed/float(sample_size)
 
-    # sampling starts here
-    # at each iteration, select a vertex v with probability prop. to (deg(v) choose 2)
-    # then pick any two neighbors of v and check if they are connected by some edge
-    for s in range(sample_size):
-        v = sample_vertex(deg_table, wedges)
-        closed += check_random_edge(G, v)
+# G as a csr_graph (or csr_DAG), for the vectorized samplers. The conversion is cached on G.
+def as_csr(G):
+    return alias_sampler.csr_view(G)
 
-    return closed/float(sample_size)
+# G: csr_graph, v: array of vertices of degree at least 2, rng: NumPy random generator
+# vectorized check_random_edge: for each v[k], pick two distinct neighbors u.a.r. (by index in the neighbor list),
+# and return the boolean array of whether they are connected
+def check_random_edges(G, v, rng):
+    deg = G.deg[v].astype(np.int64)
+    i = rng.integers(0, deg)
+    j = rng.integers(0, deg-1)
+    j += (j >= i)
+    return G.Has_edges(G.indices[G.indptr[v]+i], G.indices[G.indptr[v]+j])
 
 # pick two vertices u.a.r. from the adjacent list of v and check if they are neighbors
+# (the list works for both the set in graph and the neighbor array in csr_graph)
 def check_random_edge(G, v):
-    [v1, v2] = random.sample(G.adj_list[v],2)
+    [v1, v2] = random.sample(list(G.adj_list[v]),2)
     return G.isEdge(v1,v2)
 
 # seclect a vertex v with probability prop. to (deg(v) choose 2)
@@ -138,13 +235,13 @@ def sample_vertex(deg_table, wedges):
     r = np.random.randint(wedges)
     start = 0
     end = len(deg_table)-1
-    cur = (start+end)/2
+    cur = (start+end)//2
     while cur != start:
         if r >= deg_table[cur][0]:
             start = cur
         else:
             end = cur
 
-        cur = (start+end)/2
+        cur = (start+end)//2
 
     return deg_table[cur][1]